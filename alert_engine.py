@@ -0,0 +1,138 @@
+from datetime import datetime
+
+from alert_index import SEVERITY_RANK
+
+# Severity thresholds per rule; a rule fires at the most severe level reached.
+# Deviations are measured against the segment's running baseline: sound in
+# dB, flow as a fraction of the baseline flow rate.
+DEFAULT_THRESHOLDS = {
+    'pacp_score': {'critical': 5, 'high': 4},
+    'risk_score': {'critical': 9.0, 'high': 7.0},
+    'sound_deviation': {'high': 20.0, 'medium': 12.0},
+    'flow_deviation': {'high': 0.6, 'medium': 0.4},
+    'temperature': {'high': 35.0, 'medium': 30.0},
+}
+
+# Readings a segment needs before baseline deviation rules apply
+BASELINE_MIN_READINGS = 5
+
+# Seconds during which further alerts for a segment are suppressed unless
+# they are more severe than the last one raised
+SUPPRESSION_WINDOW_SECONDS = 3600
+
+# Confidence reported for alerts raised directly from sensor thresholds
+SENSOR_ALERT_CONFIDENCE = 0.95
+
+
+class Baseline:
+    """Running mean of a segment's sound level and flow rate"""
+
+    __slots__ = ('count', 'sound', 'flow')
+
+    def __init__(self):
+        self.count = 0
+        self.sound = 0.0
+        self.flow = 0.0
+
+    def observe(self, sound, flow):
+        self.count += 1
+        self.sound += (sound - self.sound) / self.count
+        self.flow += (flow - self.flow) / self.count
+
+
+class AlertEngine:
+    """Evaluate each ingested reading against configurable thresholds.
+
+    Keeps a per-segment baseline for deviation rules and a per-segment
+    suppression window so a noisy sensor cannot flood the alert list. At
+    most one alert is raised per reading, at the most severe level any rule
+    reached, with every firing rule listed in the message.
+    """
+
+    def __init__(self, thresholds=None, suppression_window=SUPPRESSION_WINDOW_SECONDS):
+        self.thresholds = {rule: dict(levels) for rule, levels in DEFAULT_THRESHOLDS.items()}
+        for rule, levels in (thresholds or {}).items():
+            self.thresholds[rule] = dict(levels)
+        self.suppression_window = suppression_window
+        self.suppressed = 0
+        self._baselines = {}
+        self._last_alert = {}
+
+    def prime(self, store):
+        """Build baselines from readings already in the store, without alerting"""
+        for row in store.time_range():
+            self._baseline(store.segments.decode(store.segment_code[row])).observe(
+                store.sound_level[row], store.flow_rate[row])
+
+    def _baseline(self, segment_id):
+        baseline = self._baselines.get(segment_id)
+        if baseline is None:
+            baseline = self._baselines[segment_id] = Baseline()
+        return baseline
+
+    def _level(self, rule, value):
+        """Return the most severe level whose threshold value reaches"""
+        levels = self.thresholds.get(rule, {})
+        for severity in sorted(levels, key=SEVERITY_RANK.get, reverse=True):
+            if value >= levels[severity]:
+                return severity
+        return None
+
+    def evaluate(self, store, row):
+        """Evaluate one stored reading and return a new alert dict, or None"""
+        segment_id = store.segments.decode(store.segment_code[row])
+        pacp = store.pacp_definition(row)
+        code, name, pacp_score = pacp['code'], pacp['name'], pacp['score']
+        risk_score = round(store.risk_score[row], 1)
+        sound = round(store.sound_level[row], 1)
+        flow = round(store.flow_rate[row], 2)
+        temperature = round(store.temperature[row], 1)
+
+        findings = []
+        level = self._level('pacp_score', pacp_score)
+        if level:
+            findings.append((level, f'{name} detected. PACP {code}.'))
+        level = self._level('risk_score', risk_score)
+        if level:
+            findings.append((level, f'Risk score {risk_score}/10.'))
+        level = self._level('temperature', temperature)
+        if level:
+            findings.append((level, f'Temperature {temperature}°C.'))
+
+        baseline = self._baseline(segment_id)
+        if baseline.count >= BASELINE_MIN_READINGS:
+            deviation = sound - baseline.sound
+            level = self._level('sound_deviation', abs(deviation))
+            if level:
+                findings.append((level, f'Sound level {sound} dB is {deviation:+.1f} dB from baseline.'))
+            if baseline.flow:
+                deviation = (flow - baseline.flow) / baseline.flow
+                level = self._level('flow_deviation', abs(deviation))
+                if level:
+                    findings.append((level, f'Flow rate {flow} L/s is {deviation:+.0%} from baseline.'))
+        baseline.observe(sound, flow)
+
+        if not findings:
+            return None
+
+        severity = max((level for level, _ in findings), key=SEVERITY_RANK.get)
+        timestamp = store.timestamp[row]
+        last = self._last_alert.get(segment_id)
+        if last is not None and timestamp - last[0] < self.suppression_window \
+                and SEVERITY_RANK[severity] <= SEVERITY_RANK[last[1]]:
+            self.suppressed += 1
+            return None
+        self._last_alert[segment_id] = (timestamp, severity)
+
+        action = 'Immediate action required.' if severity == 'critical' else 'Inspection recommended.'
+        return {
+            'pipeSegmentId': segment_id,
+            'pipeSegmentName': store.segment_name(row),
+            'severity': severity,
+            'message': ' '.join(message for _, message in findings) + ' ' + action,
+            'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+            'pacp_code': code,
+            'pacp_score': pacp_score,
+            'confidence': SENSOR_ALERT_CONFIDENCE,
+            'source': store.reading_id(row),
+        }
@@ -0,0 +1,153 @@
+from bisect import insort
+from datetime import datetime
+
+from data_version import next_version
+from query import QueryError, page
+
+SEVERITY_RANK = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+
+
+class AlertIndex:
+    """Alerts kept in severity and time order with segment and PACP indexes.
+
+    Alerts are addressed by their insertion position, which doubles as the
+    pagination cursor.
+    """
+
+    def __init__(self, alerts=()):
+        self._alerts = []
+        # POSIX seconds per alert, so time filters agree with ReadingStore
+        # whether or not ``since``/``until`` carry a timezone
+        self._seconds = []
+        self._segment_names = {}
+        # Positions in time and in severity order, overall and per segment
+        # and PACP code (the latter two as (time, severity) pairs)
+        self._time_order = []
+        self._severity_order = []
+        self._by_segment = {}
+        self._by_pacp = {}
+        self._severity_counts = dict.fromkeys(SEVERITY_RANK, 0)
+        self.version = next_version()
+        for alert in alerts:
+            self.add(alert)
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def __iter__(self):
+        """Iterate alerts most severe first, newest first within a severity"""
+        return (self._alerts[pos] for pos in reversed(self._severity_order))
+
+    def add(self, alert):
+        """Index one alert dict and return its position"""
+        pos = len(self._alerts)
+        self._alerts.append(alert)
+        self._seconds.append(datetime.fromisoformat(alert['timestamp']).timestamp())
+        self._segment_names[alert['pipeSegmentId']] = alert['pipeSegmentName']
+        self._severity_counts[alert['severity']] += 1
+        for time_order, severity_order in (
+                (self._time_order, self._severity_order),
+                self._by_segment.setdefault(alert['pipeSegmentId'], ([], [])),
+                self._by_pacp.setdefault(alert['pacp_code'], ([], []))):
+            insort(time_order, pos, key=self._time_key)
+            insort(severity_order, pos, key=self._severity_key)
+        self.version = next_version()
+        return pos
+
+    def get(self, pos):
+        return self._alerts[pos]
+
+    def severity_counts(self):
+        """Return the number of alerts per severity, most severe first"""
+        return {severity: self._severity_counts[severity] for severity in reversed(SEVERITY_RANK)}
+
+    def _severity_key(self, pos):
+        return (SEVERITY_RANK[self._alerts[pos]['severity']], self._seconds[pos], pos)
+
+    def _time_key(self, pos):
+        return (self._seconds[pos], pos)
+
+    def match_segments(self, term):
+        """Return segment ids equal to term or whose name contains it"""
+        term = term.lower()
+        return [
+            segment_id for segment_id, name in self._segment_names.items()
+            if segment_id == term or term in name.lower()
+        ]
+
+    def query(self, segment=None, pacp_code=None, severity=None, min_score=None, max_score=None,
+              since=None, until=None, sort='-severity', limit=None, cursor=None):
+        """Return (alerts, next_cursor) for one filtered, sorted page.
+
+        ``min_score``/``max_score`` bound pacp_score. ``-severity`` (the
+        default) lists critical alerts first, newest first within a severity.
+        The narrower of the segment and PACP indexes drives the walk, and the
+        leading field of the sort (the time window, or ``severity``) is
+        clipped by binary search; the remaining filters are checked per row.
+        """
+        if cursor is not None and not 0 <= cursor < len(self):
+            raise QueryError('cursor is not valid')
+        if severity is not None and severity not in SEVERITY_RANK:
+            raise QueryError(f"severity must be one of {', '.join(SEVERITY_RANK)}")
+
+        by_time = sort.lstrip('-') == 'timestamp'
+        key, order = (self._time_key, 0) if by_time else (self._severity_key, 1)
+
+        segment_ids = segment_sources = pacp_source = None
+        if segment is not None:
+            segment_ids = set(self.match_segments(segment))
+            segment_sources = [self._by_segment[segment_id][order] for segment_id in segment_ids]
+        if pacp_code is not None:
+            pacp_source = self._by_pacp.get(pacp_code, ([], []))[order]
+
+        # Drive the walk from the narrowest index and check the others per row
+        check_segment = check_pacp = False
+        if segment_sources is not None and (
+                pacp_source is None or sum(map(len, segment_sources)) <= len(pacp_source)):
+            sources = segment_sources
+            check_pacp = pacp_source is not None
+        elif pacp_source is not None:
+            sources = [pacp_source]
+            check_segment = segment_sources is not None
+        else:
+            sources = [self._time_order if by_time else self._severity_order]
+
+        since = since.timestamp() if since is not None else None
+        until = until.timestamp() if until is not None else None
+        lo = hi = None
+        if by_time:
+            lo = None if since is None else (since, -1)
+            hi = None if until is None else (until, -1)
+        elif severity is not None:
+            lo, hi = (SEVERITY_RANK[severity],), (SEVERITY_RANK[severity] + 1,)
+
+        def predicate(pos):
+            alert = self._alerts[pos]
+            if check_pacp and alert['pacp_code'] != pacp_code:
+                return False
+            if check_segment and alert['pipeSegmentId'] not in segment_ids:
+                return False
+            if by_time and severity is not None and alert['severity'] != severity:
+                return False
+            if min_score is not None and alert['pacp_score'] < min_score:
+                return False
+            if max_score is not None and alert['pacp_score'] > max_score:
+                return False
+            if not by_time and since is not None and self._seconds[pos] < since:
+                return False
+            if not by_time and until is not None and self._seconds[pos] >= until:
+                return False
+            return True
+
+        positions, next_cursor = page(sources, key, limit, cursor, sort.startswith('-'), predicate, lo=lo, hi=hi)
+        return [self._alerts[pos] for pos in positions], next_cursor
+
+    def iter_query(self, batch_size, **params):
+        """Yield every alert matching a query, one page at a time"""
+        params = dict(params, limit=batch_size)
+        while True:
+            alerts, cursor = self.query(**params)
+            yield from alerts
+            if cursor is None:
+                return
+            params['cursor'] = cursor
@@ -1,74 +1,33 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, g, render_template, jsonify, request
 from datetime import datetime, timedelta
 import random
 import json
+import math
+import os
+import threading
+import time
 
-app = Flask(__name__)
+from alert_engine import AlertEngine
+from alert_index import AlertIndex
+from data_version import next_version
+from events import EventBus, sse_stream
+from fleet_metrics import FleetMetrics
+from instrumentation import PHASES, RequestStats, TimedJSONProvider, timed
+from pacp_catalog import PACP_CODES_ETAG, PACP_CODES_JSON, get_random_pacp_code
+import exports
+import pacp_catalog
+from query import QueryError, parse_query
+from reading_store import ReadingStore
+from response_cache import ResponseCache
+from risk_scoring import RiskScorer
+import rollups
+from rollups import RollupIndex
+from spatial_index import MAX_ZOOM, MIN_ZOOM, GridIndex, to_geojson
 
-# PACP defect code mappings (compliant with PACP 7.0)
-PACP_CODES = {
-    'corrosion': [
-        {'code': 'COR-1', 'name': 'Light Corrosion', 'score': 1, 'description': 'Surface oxidation visible'},
-        {'code': 'COR-2', 'name': 'Moderate Corrosion', 'score': 2, 'description': 'Material thinning <10%'},
-        {'code': 'COR-3', 'name': 'Medium Corrosion', 'score': 3, 'description': 'Material thinning 10-30%'},
-        {'code': 'COR-4', 'name': 'Severe Corrosion', 'score': 4, 'description': 'Material thinning 30-50%'},
-        {'code': 'COR-5', 'name': 'Critical Corrosion', 'score': 5, 'description': 'Material thinning >50%'},
-    ],
-    'crack': [
-        {'code': 'CL-1', 'name': 'Hairline Longitudinal Crack', 'score': 1, 'description': 'Width <1mm'},
-        {'code': 'CL-2', 'name': 'Minor Longitudinal Crack', 'score': 2, 'description': 'Width 1-3mm'},
-        {'code': 'CL-3', 'name': 'Medium Longitudinal Crack', 'score': 3, 'description': 'Width 3-10mm'},
-        {'code': 'CL-4', 'name': 'Severe Longitudinal Crack', 'score': 4, 'description': 'Width >10mm'},
-        {'code': 'CL-5', 'name': 'Critical Longitudinal Crack', 'score': 5, 'description': 'Structural failure'},
-        {'code': 'CR-1', 'name': 'Hairline Circumferential Crack', 'score': 1, 'description': 'Width <1mm'},
-        {'code': 'CR-2', 'name': 'Minor Circumferential Crack', 'score': 2, 'description': 'Width 1-3mm'},
-        {'code': 'CR-3', 'name': 'Medium Circumferential Crack', 'score': 3, 'description': 'Width 3-10mm'},
-        {'code': 'FR-4', 'name': 'Severe Fracture', 'score': 4, 'description': 'Pipe segments separated'},
-        {'code': 'FR-5', 'name': 'Critical Fracture', 'score': 5, 'description': 'Complete structural failure'},
-    ],
-    'deposit': [
-        {'code': 'DEP-1', 'name': 'Light Deposits', 'score': 1, 'description': 'Coverage <20%'},
-        {'code': 'DEP-2', 'name': 'Moderate Deposits', 'score': 2, 'description': 'Coverage 20-50%'},
-        {'code': 'DEP-3', 'name': 'Heavy Deposits', 'score': 3, 'description': 'Coverage >50%'},
-    ],
-    'root': [
-        {'code': 'RO-1', 'name': 'Fine Roots', 'score': 1, 'description': 'Fine root hairs'},
-        {'code': 'RO-2', 'name': 'Tap Root', 'score': 2, 'description': 'Single root penetration'},
-        {'code': 'RO-3', 'name': 'Medium Root Mass', 'score': 3, 'description': 'Multiple roots, flow restricted'},
-        {'code': 'RO-4', 'name': 'Severe Root Intrusion', 'score': 4, 'description': 'Heavy root mass, blockage'},
-    ],
-    'deformation': [
-        {'code': 'DEF-1', 'name': 'Minor Deformation', 'score': 1, 'description': '<5% diameter change'},
-        {'code': 'DEF-2', 'name': 'Moderate Deformation', 'score': 2, 'description': '5-10% diameter change'},
-        {'code': 'DEF-3', 'name': 'Severe Deformation', 'score': 3, 'description': '>10% diameter change'},
-    ]
-}
-
-DEFECT_CATEGORIES = ['corrosion', 'crack', 'deposit', 'root', 'deformation']
-
-def get_random_pacp_code(severity='random'):
-    """Get a random PACP code based on severity"""
-    if severity == 'random':
-        category = random.choice(DEFECT_CATEGORIES)
-        return random.choice(PACP_CODES[category])
-    elif severity == 'critical':
-        # Get codes with score 4-5
-        high_severity_codes = []
-        for category in DEFECT_CATEGORIES:
-            high_severity_codes.extend([c for c in PACP_CODES[category] if c['score'] >= 4])
-        return random.choice(high_severity_codes)
-    elif severity == 'high':
-        # Get codes with score 3-4
-        med_severity_codes = []
-        for category in DEFECT_CATEGORIES:
-            med_severity_codes.extend([c for c in PACP_CODES[category] if 3 <= c['score'] <= 4])
-        return random.choice(med_severity_codes)
-    else:
-        # Get codes with score 1-2
-        low_severity_codes = []
-        for category in DEFECT_CATEGORIES:
-            low_severity_codes.extend([c for c in PACP_CODES[category] if c['score'] <= 2])
-        return random.choice(low_severity_codes)
+init_started = time.perf_counter()
+
+app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 
 # Mock data generators
 def generate_pipe_segments():
@@ -101,9 +60,39 @@ def generate_pipe_segments():
     
     return segments
 
-def generate_sensor_readings(pipe_segments):
+def generate_synthetic_segments(count):
+    """Generate ``count`` random pipe segments around Ann Arbor, for load testing"""
+    pipe_types = ['PVC', 'Concrete', 'Clay', 'HDPE']
+    # (quality, weight, durability range, age range)
+    profiles = [
+        ('Poor', 0.25, (15, 30), (40, 60)),
+        ('Fair', 0.15, (55, 70), (25, 40)),
+        ('Good', 0.45, (75, 90), (10, 25)),
+        ('Great', 0.15, (90, 98), (1, 10)),
+    ]
+    weights = [profile[1] for profile in profiles]
+    segments = []
+    for i in range(count):
+        quality, _, durability, age = random.choices(profiles, weights)[0]
+        segments.append({
+            'id': f'pipe-{i + 1}',
+            'name': f'{chr(65 + i % 26)}-{i // 26 + 1:03d}',
+            'quality': quality,
+            'pipeType': random.choice(pipe_types),
+            'diameter': random.choice([150, 200, 250, 300]),
+            'lengthMeters': random.randint(100, 250),
+            'estimatedAge': random.randint(*age),
+            'durabilityScore': random.randint(*durability),
+            'latitude': round(42.2808 + random.uniform(-0.1, 0.1), 6),
+            'longitude': round(-83.7430 + random.uniform(-0.15, 0.15), 6),
+            'lastInspectionDate': (datetime.now() - timedelta(days=random.randint(10, 365))).isoformat()
+        })
+    return segments
+
+def generate_sensor_readings(pipe_segments, count=100):
     readings = []
-    for i in range(100):
+    now = time.time()
+    for i in range(count):
         pipe = random.choice(pipe_segments)
         
         # Generate PACP observation based on sensor data
@@ -112,87 +101,137 @@ def generate_sensor_readings(pipe_segments):
         # Calculate risk score based on PACP score
         risk_score = round((pacp_code['score'] / 5) * 10, 1)
         
-        reading = {
-            'id': f'reading-{i+1}',
-            'pipeSegmentId': pipe['id'],
-            'pipeSegmentName': pipe['name'],
-            'timestamp': (datetime.now() - timedelta(hours=random.randint(0, 72))).isoformat(),
-            'temperature': round(20 + random.uniform(-5, 10), 1),
-            'soundLevel': round(45 + random.uniform(-10, 25), 1),
-            'flowRate': round(random.uniform(5, 20), 2),
-            'cameraImageUrl': f'/static/images/camera-{random.randint(1, 5)}.jpg' if random.random() > 0.3 else None,
-            # PACP fields
-            'pacp_code': pacp_code['code'],
-            'pacp_name': pacp_code['name'],
-            'pacp_score': pacp_code['score'],
-            'observation': pacp_code['description'],
-            'risk_score': risk_score
-        }
-        readings.append(reading)
+        readings.append((
+            pipe['id'],
+            pipe['name'],
+            now - 3600 * random.randint(0, 72),
+            round(20 + random.uniform(-5, 10), 1),
+            round(45 + random.uniform(-10, 25), 1),
+            round(random.uniform(5, 20), 2),
+            pacp_code['code'],
+            risk_score,
+            f'/static/images/camera-{random.randint(1, 5)}.jpg' if random.random() > 0.3 else None
+        ))
     
-    return sorted(readings, key=lambda x: x['timestamp'], reverse=True)
+    # Append oldest first so the store's time index stays append-only
+    store = ReadingStore()
+    for reading in sorted(readings, key=lambda x: x[2]):
+        store.append(*reading)
+    
+    return store
 
-def generate_ai_analysis(pipe_segments):
-    corrosion_levels = ['None', 'Low', 'Medium', 'High', 'Critical']
-    priorities = ['Low', 'Medium', 'High', 'Critical']
-    soil_contaminants = ['Heavy Metals', 'Industrial Waste', 'Organic Matter', 'Chemical Residue']
+# Largest finite float32, the width of the sensor reading columns
+FLOAT32_MAX = 3.4028234663852886e38
+
+# Serializes ingest: the reading store, rollups, alert index and analyses
+# are updated together and none of them is safe under concurrent writers
+ingest_lock = threading.Lock()
+
+SOIL_CONTAMINANTS = ['Heavy Metals', 'Industrial Waste', 'Organic Matter', 'Chemical Residue']
+PRIORITY_ORDER = {'Critical': 4, 'High': 3, 'Medium': 2, 'Low': 1}
+
+def build_analysis(pipe, score, previous=None):
+    """Build the AI analysis record for one segment from its risk score.
+
+    Fields not derived from the score (soil contamination, defect location)
+    are kept from ``previous`` so a rescore does not redraw them.
+    """
+    priority = score['maintenancePriority']
     
-    analyses = []
+    # Use the worst recently observed defect, or a representative code
+    if score['worstReading'] is not None:
+        pacp_code = sensor_readings.pacp_definition(score['worstReading'])
+    elif priority == 'Critical':
+        pacp_code = get_random_pacp_code('critical')
+    elif priority == 'High':
+        pacp_code = get_random_pacp_code('high')
+    else:
+        pacp_code = get_random_pacp_code('low')
     
-    # Generate AI analysis for Fair and Poor quality pipes
+    if previous is not None:
+        soil = previous['soilContaminationDetected']
+        defect_location = previous['defect_location_meters']
+    else:
+        soil = random.sample(SOIL_CONTAMINANTS, random.randint(1, 3)) if random.random() > 0.5 else []
+        defect_location = round(random.uniform(5, pipe['lengthMeters'] - 5), 1)
+
+    confidence = score['confidence']
+    return {
+        'id': f'analysis-{pipe["id"]}',
+        'pipeSegmentId': pipe['id'],
+        'pipeSegmentName': pipe['name'],
+        'corrosionLevel': score['corrosionLevel'],
+        'corrosionConfidence': confidence,
+        'maintenancePriority': priority,
+        'durabilityScore': score['durabilityScore'],
+        'riskScore': score['riskScore'],
+        'estimatedFinancialAge': pipe['estimatedAge'] + round(score['riskScore'] * 15),
+        'predictedFailureMonths': score['predictedFailureMonths'],
+        'soilContaminationDetected': soil,
+        'recommendations': f"Schedule {'immediate' if priority == 'Critical' else 'priority'} inspection and repair",
+        # PACP name, score and description are filled in from the catalogue
+        'pacp_code': pacp_code['code'],
+        'defect_location_meters': defect_location,
+        'confidence_level': 'high' if confidence > 0.85 else 'medium' if confidence > 0.70 else 'low'
+    }
+
+def generate_ai_analysis(pipe_segments):
+    """Score the whole fleet in one batch; segments at Low priority get no analysis"""
+    scores = risk_scorer.score(pipe_segments)
+    analyses = {}
     for pipe in pipe_segments:
-        if pipe['quality'] in ['Fair', 'Poor']:
-            corrosion_level = random.choice(corrosion_levels[2:]) if pipe['quality'] == 'Poor' else random.choice(corrosion_levels[1:3])
-            priority = 'Critical' if pipe['quality'] == 'Poor' else random.choice(priorities[1:3])
-            
-            # Get appropriate PACP code based on severity
-            if priority == 'Critical':
-                pacp_code = get_random_pacp_code('critical')
-            elif priority == 'High':
-                pacp_code = get_random_pacp_code('high')
-            else:
-                pacp_code = get_random_pacp_code('low')
-            
-            # Generate confidence score (higher for more severe issues)
-            base_confidence = 0.75 if priority == 'Critical' else 0.70
-            confidence = round(base_confidence + random.uniform(0, 0.20), 4)
-            
-            analysis = {
-                'id': f'analysis-{pipe["id"]}',
-                'pipeSegmentId': pipe['id'],
-                'pipeSegmentName': pipe['name'],
-                'corrosionLevel': corrosion_level,
-                'corrosionConfidence': confidence,
-                'maintenancePriority': priority,
-                'estimatedFinancialAge': pipe['estimatedAge'] + random.randint(5, 15),
-                'predictedFailureMonths': random.randint(4, 48) if pipe['quality'] == 'Poor' else random.randint(12, 60),
-                'soilContaminationDetected': random.sample(soil_contaminants, random.randint(1, 3)) if random.random() > 0.5 else [],
-                'recommendations': f"Schedule {'immediate' if priority == 'Critical' else 'priority'} inspection and repair",
-                # PACP fields
-                'pacp_code': pacp_code['code'],
-                'pacp_name': pacp_code['name'],
-                'pacp_score': pacp_code['score'],
-                'pacp_description': pacp_code['description'],
-                'defect_location_meters': round(random.uniform(5, pipe['lengthMeters'] - 5), 1),
-                'confidence_level': 'high' if confidence > 0.85 else 'medium' if confidence > 0.70 else 'low'
-            }
-            analyses.append(analysis)
-    
-    # Sort by priority
-    priority_order = {'Critical': 4, 'High': 3, 'Medium': 2, 'Low': 1}
-    return sorted(analyses, key=lambda x: priority_order[x['maintenancePriority']], reverse=True)
+        if scores[pipe['id']]['maintenancePriority'] != 'Low':
+            analyses[pipe['id']] = build_analysis(pipe, scores[pipe['id']])
+    return analyses
+
+def refresh_analysis(segment):
+    """Rescore one segment after new readings and publish its analysis if it changed"""
+    global analyses_version
+    score = risk_scorer.score([segment])[segment['id']]
+    previous = ai_analyses.get(segment['id'])
+    if score['maintenancePriority'] == 'Low':
+        if previous is not None:
+            del ai_analyses[segment['id']]
+            analyses_version = next_version()
+        return
+    if previous is not None and all(previous[k] == score[k] for k in ('maintenancePriority', 'corrosionLevel', 'predictedFailureMonths')):
+        return
+    analysis = build_analysis(segment, score, previous)
+    ai_analyses[segment['id']] = analysis
+    analyses_version = next_version()
+    event_bus.publish('analysis', json.dumps(pacp_catalog.expand_analysis(analysis)))
+
+def sorted_analyses():
+    analyses = sorted(ai_analyses.values(), key=lambda x: PRIORITY_ORDER[x['maintenancePriority']], reverse=True)
+    return [pacp_catalog.expand_analysis(a) for a in analyses]
+
+def iter_analyses(categories=()):
+    """Yield expanded analyses most urgent first, one priority at a time.
+
+    Only references to the current analyses are copied (ingest may replace
+    them meanwhile); each one is expanded as it is yielded.
+    """
+    analyses = list(ai_analyses.values())
+    for priority in sorted(PRIORITY_ORDER, key=PRIORITY_ORDER.get, reverse=True):
+        for analysis in analyses:
+            if analysis['maintenancePriority'] != priority:
+                continue
+            if categories and pacp_catalog.CATEGORY_OF.get(analysis['pacp_code']) not in categories:
+                continue
+            yield pacp_catalog.expand_analysis(analysis)
 
 def generate_alerts(pipe_segments, ai_analyses):
     alerts = []
     alert_id = 1
     
-    for analysis in ai_analyses:
+    for analysis in ai_analyses.values():
         if analysis['maintenancePriority'] in ['Critical', 'High']:
             severity = 'critical' if analysis['maintenancePriority'] == 'Critical' else 'high'
             
             # Create detailed message with PACP code
-            pacp_info = f"PACP {analysis['pacp_code']}"
-            message = f"{analysis['pacp_name']} detected. {pacp_info}. Immediate action required. Predicted failure in {analysis['predictedFailureMonths']} months."
+            pacp_code = pacp_catalog.BY_CODE[analysis['pacp_code']]
+            pacp_info = f"PACP {pacp_code['code']}"
+            message = f"{pacp_code['name']} detected. {pacp_info}. Immediate action required. Predicted failure in {analysis['predictedFailureMonths']} months."
             
             alert = {
                 'id': f'alert-{alert_id}',
@@ -202,20 +241,95 @@ def generate_alerts(pipe_segments, ai_analyses):
                 'message': message,
                 'timestamp': (datetime.now() - timedelta(hours=random.randint(1, 48))).isoformat(),
                 # PACP fields
-                'pacp_code': analysis['pacp_code'],
-                'pacp_score': analysis['pacp_score'],
+                'pacp_code': pacp_code['code'],
+                'pacp_score': pacp_code['score'],
                 'confidence': analysis['corrosionConfidence']
             }
             alerts.append(alert)
             alert_id += 1
     
-    return sorted(alerts, key=lambda x: (x['severity'] == 'critical', x['timestamp']), reverse=True)
+    return alerts
+
+def ingest_reading(payload):
+    """Validate and append one sensor reading, then publish it to live clients"""
+    if not isinstance(payload, dict):
+        raise ValueError('body must be a JSON object')
+    segment_id = payload.get('pipeSegmentId')
+    segment = segment_index.get(segment_id) if isinstance(segment_id, str) else None
+    if segment is None:
+        raise ValueError('pipeSegmentId must name a known pipe segment')
+    code = payload.get('pacp_code')
+    pacp_code = pacp_catalog.BY_CODE.get(code) if isinstance(code, str) else None
+    if pacp_code is None:
+        raise ValueError('pacp_code must be a PACP 7.0 code')
+    camera_image_url = payload.get('cameraImageUrl')
+    if camera_image_url is not None and not isinstance(camera_image_url, str):
+        raise ValueError('cameraImageUrl must be a string')
+    try:
+        values = [float(payload[field]) for field in ('temperature', 'soundLevel', 'flowRate')]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('temperature, soundLevel and flowRate must be numbers')
+    if not all(math.isfinite(value) and abs(value) <= FLOAT32_MAX for value in values):
+        raise ValueError('temperature, soundLevel and flowRate must be finite numbers')
+    timestamp = payload.get('timestamp')
+    if timestamp is None:
+        timestamp = datetime.now()
+    else:
+        if not isinstance(timestamp, str):
+            raise ValueError('timestamp must be an ISO 8601 string')
+        try:
+            timestamp = datetime.fromisoformat(timestamp)
+        except ValueError:
+            raise ValueError('timestamp must be an ISO 8601 string')
+
+    with ingest_lock:
+        row = sensor_readings.append(
+            segment['id'],
+            segment['name'],
+            timestamp,
+            *values,
+            pacp_code['code'],
+            round((pacp_code['score'] / 5) * 10, 1),
+            camera_image_url
+        )
+        segment_rollups.observe(sensor_readings, row)
+        event_bus.publish('reading', sensor_readings.row_json(row))
+
+        alert = alert_engine.evaluate(sensor_readings, row)
+        if alert is not None:
+            record_alert(alert)
+        refresh_analysis(segment)
+    return row
 
-# Initialize data
-pipe_segments = generate_pipe_segments()
-sensor_readings = generate_sensor_readings(pipe_segments)
+def record_alert(alert):
+    """Index a new alert and publish it to live clients; call with ingest_lock held"""
+    alert.setdefault('id', f'alert-{len(alerts) + 1}')
+    alerts.add(alert)
+    event_bus.publish('alert', json.dumps(alert))
+
+# Initialize data. PIPEVISION_SEGMENTS replaces the demo network with a
+# synthetic one of that size, PIPEVISION_READINGS sets the number of
+# readings generated and PIPEVISION_SEED makes both reproducible (see
+# benchmarks/).
+if 'PIPEVISION_SEED' in os.environ:
+    random.seed(int(os.environ['PIPEVISION_SEED']))
+event_bus = EventBus()
+request_stats = RequestStats()
+segment_count = int(os.environ.get('PIPEVISION_SEGMENTS', 0))
+pipe_segments = generate_synthetic_segments(segment_count) if segment_count else generate_pipe_segments()
+fleet_metrics = FleetMetrics(pipe_segments)
+segment_index = GridIndex(pipe_segments)
+sensor_readings = generate_sensor_readings(pipe_segments, int(os.environ.get('PIPEVISION_READINGS', 100)))
+segment_rollups = RollupIndex()
+segment_rollups.prime(sensor_readings)
+risk_scorer = RiskScorer(sensor_readings)
 ai_analyses = generate_ai_analysis(pipe_segments)
-alerts = generate_alerts(pipe_segments, ai_analyses)
+analyses_version = next_version()
+alerts = AlertIndex(generate_alerts(pipe_segments, ai_analyses))
+alert_engine = AlertEngine()
+alert_engine.prime(sensor_readings)
+response_cache = ResponseCache.from_env()
+request_stats.startup_seconds = round(time.perf_counter() - init_started, 3)
 
 # Routes
 @app.route('/')
@@ -234,62 +348,205 @@ def raw_data():
 def ai_analysis_view():
     return render_template('ai-analysis.html')
 
+@app.route('/alerts')
+def alerts_view():
+    return render_template('alerts.html')
+
 # API endpoints
 @app.route('/api/pipe-segments')
+@response_cache.cached(lambda: segment_index.version)
 def get_pipe_segments():
     return jsonify(pipe_segments)
 
+@app.route('/api/pipe-segments/<segment_id>')
+@response_cache.cached(lambda: segment_index.version)
+def get_pipe_segment(segment_id):
+    segment = segment_index.get(segment_id)
+    if segment is None:
+        return jsonify({'error': f'Unknown pipe segment {segment_id}'}), 404
+    return jsonify(segment)
+
+@app.route('/api/pipe-segments/bbox')
+@response_cache.cached(lambda: (segment_index.version, sensor_readings.max_pacp_version))
+def get_pipe_segments_in_bbox():
+    """Return segments inside ?bbox=west,south,east,north as compact GeoJSON,
+    clustered according to ?zoom="""
+    try:
+        west, south, east, north = (float(v) for v in request.args['bbox'].split(','))
+        zoom = int(request.args.get('zoom', 13))
+    except (KeyError, ValueError):
+        raise QueryError('bbox must be west,south,east,north and zoom an integer')
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        raise QueryError('bbox coordinates must be finite numbers')
+    if not MIN_ZOOM <= zoom <= MAX_ZOOM:
+        raise QueryError(f'zoom must be between {MIN_ZOOM} and {MAX_ZOOM}')
+    west, east = (min(max(v, -180.0), 180.0) for v in (west, east))
+    south, north = (min(max(v, -90.0), 90.0) for v in (south, north))
+    segments = segment_index.query(west, south, east, north)
+    return jsonify(to_geojson(segments, zoom, sensor_readings.max_pacp_score))
+
+@app.route('/api/pipe-segments/<segment_id>/rollups')
+@response_cache.cached(lambda: segment_rollups.version)
+def get_pipe_segment_rollups(segment_id):
+    """Return a segment's min/max/mean/count buckets at ?resolution=1m|1h|1d"""
+    if segment_index.get(segment_id) is None:
+        return jsonify({'error': f'Unknown pipe segment {segment_id}'}), 404
+    resolution = request.args.get('resolution', '1h')
+    if resolution not in segment_rollups.resolutions:
+        raise QueryError(f"resolution must be one of {', '.join(segment_rollups.resolutions)}")
+    params = parse_query(request.args, ('timestamp',), 'timestamp')
+    return jsonify({
+        'pipeSegmentId': segment_id,
+        'resolution': resolution,
+        'buckets': segment_rollups.buckets(segment_id, resolution, params['since'], params['until']),
+    })
+
+@app.route('/api/pipe-segments/<segment_id>/history')
+@response_cache.cached(lambda: (sensor_readings.version, segment_rollups.version))
+def get_pipe_segment_history(segment_id):
+    """Return one ?metric= of a segment's sensor history, downsampled to at most ?points="""
+    if segment_index.get(segment_id) is None:
+        return jsonify({'error': f'Unknown pipe segment {segment_id}'}), 404
+    metric = request.args.get('metric', 'temperature')
+    if metric not in rollups.METRICS:
+        raise QueryError(f"metric must be one of {', '.join(rollups.METRICS)}")
+    points = request.args.get('points', str(rollups.DEFAULT_HISTORY_POINTS))
+    if not points.isdigit() or not 3 <= int(points) <= rollups.MAX_HISTORY_POINTS:
+        raise QueryError(f'points must be between 3 and {rollups.MAX_HISTORY_POINTS}')
+    params = parse_query(request.args, ('timestamp',), 'timestamp')
+    resolution, history = segment_rollups.history(
+        sensor_readings, segment_id, metric, int(points), params['since'], params['until'])
+    return jsonify({
+        'pipeSegmentId': segment_id,
+        'metric': metric,
+        'resolution': resolution,
+        'points': history,
+    })
+
+@app.errorhandler(QueryError)
+def handle_query_error(error):
+    return jsonify({'error': str(error)}), 400
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.phase_ms = dict.fromkeys(PHASES, 0.0)
+
+@app.after_request
+def record_request_timing(response):
+    """Time /api requests through the last byte sent, streamed bodies included"""
+    if not request.path.startswith('/api/') or response.mimetype == 'text/event-stream':
+        return response
+    route = f'{request.method} {request.url_rule.rule if request.url_rule else "<unmatched>"}'
+    started, phases = g.request_started, g.phase_ms
+    sent = [0]
+
+    def count_bytes(chunks):
+        # A streamed body is serialized as it is pulled, so each pull is timed
+        iterator = iter(chunks)
+        try:
+            while True:
+                start = time.perf_counter()
+                chunk = next(iterator, None)
+                phases['serialize'] += (time.perf_counter() - start) * 1000
+                if chunk is None:
+                    return
+                sent[0] += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def record():
+        request_stats.record(route, (time.perf_counter() - started) * 1000, phases, sent[0])
+
+    if response.is_streamed:
+        response.response = count_bytes(response.response)
+    else:
+        sent[0] = response.content_length or 0
+    response.call_on_close(record)
+    return response
+
+@app.before_request
+def capture_event_seq():
+    # Read before the view builds its snapshot: an event published while it
+    # runs may be missing from the body, so the client must still receive it
+    g.event_seq = event_bus.seq
+
+@app.after_request
+def add_event_seq(response):
+    """Tell clients which event sequence their snapshot reflects"""
+    if request.path.startswith('/api/') and 'event_seq' in g:
+        response.headers['X-Event-Seq'] = str(g.event_seq)
+    return response
+
+@app.route('/api/events')
+def get_events():
+    """Server-Sent Events stream of new readings, alerts and analyses.
+
+    Resumes after ?since= or the Last-Event-ID header.
+    """
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    if since is not None and not since.isdigit():
+        raise QueryError('since must be an event sequence number')
+    since = int(since) if since is not None else None
+    return Response(sse_stream(event_bus, since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def paginated(response, next_cursor):
+    """Attach the keyset cursor for the next page, if there is one"""
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
+
 @app.route('/api/sensor-readings')
+@response_cache.cached(lambda: sensor_readings.version)
 def get_sensor_readings():
-    return jsonify(sensor_readings)
+    params = parse_query(request.args, ('timestamp', 'risk_score'), '-timestamp')
+    rows, next_cursor = sensor_readings.query(**params)
+    body = sensor_readings.iter_json(rows)
+    if params['limit'] is not None:
+        # A bounded page is small enough to build whole, so it can be cached;
+        # an unbounded listing streams and bypasses the cache
+        with timed('serialize'):
+            body = ''.join(body)
+    return paginated(Response(body, mimetype='application/json'), next_cursor)
+
+@app.route('/api/sensor-readings', methods=['POST'])
+def post_sensor_reading():
+    try:
+        row = ingest_reading(request.get_json(force=True) or {})
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return Response(sensor_readings.row_json(row), status=201, mimetype='application/json')
+
+@app.route('/api/sensor-readings/facets')
+@response_cache.cached(lambda: sensor_readings.version)
+def get_sensor_reading_facets():
+    return jsonify({'pacp_codes': sensor_readings.pacp_facets()})
 
 @app.route('/api/ai-analysis')
+@response_cache.cached(lambda: analyses_version)
 def get_ai_analysis():
-    return jsonify(ai_analyses)
+    return jsonify(sorted_analyses())
 
 @app.route('/api/alerts')
+@response_cache.cached(lambda: alerts.version)
 def get_alerts():
-    return jsonify(alerts)
+    params = parse_query(request.args, ('severity', 'timestamp'), '-severity')
+    page, next_cursor = alerts.query(severity=request.args.get('severity') or None, **params)
+    return paginated(jsonify(page), next_cursor)
+
+@app.route('/api/alerts/summary')
+@response_cache.cached(lambda: alerts.version)
+def get_alert_summary():
+    """Return alert counts per severity, for pages that only load the first page"""
+    return jsonify(dict(alerts.severity_counts(), total=len(alerts)))
 
 @app.route('/api/metrics')
+@response_cache.cached(lambda: fleet_metrics.version)
 def get_metrics():
-    pipe_segments = generate_pipe_segments()
-    total_length = sum(p['lengthMeters'] for p in pipe_segments)
-    avg_age = round(sum(p['estimatedAge'] for p in pipe_segments) / len(pipe_segments), 1)
-    
-    # Fixed quality counts: 4 Poor, 2 Fair, 6 Good, 2 Great
-    quality_counts = {
-        'Great': 2,
-        'Good': 6,
-        'Fair': 2,
-        'Poor': 4
-    }
-    
-    # Pipe type breakdown
-    pipe_type_counts = {}
-    for p in pipe_segments:
-        pipe_type = p['pipeType']
-        pipe_type_counts[pipe_type] = pipe_type_counts.get(pipe_type, 0) + 1
-    
-    high_risk_count = 4  # Poor segments
-    
-    # Calculate average quality
-    avg_quality = 'Good'  # With 6 Good segments, average is Good
-    
-    return jsonify({
-        'totalPipeLength': total_length,
-        'averageAge': avg_age,
-        'averageQuality': avg_quality,
-        'qualityDistribution': quality_counts,
-        'qualityBreakdown': {
-            'great': 2,
-            'good': 6,
-            'fair': 2,
-            'poor': 4
-        },
-        'pipeTypeBreakdown': pipe_type_counts,
-        'highRiskSegments': high_risk_count
-    })
+    return jsonify(fleet_metrics.to_dict())
 
 @app.route('/api/recent-activity')
 def get_recent_activity():
@@ -306,12 +563,67 @@ def get_recent_activity():
     
     return jsonify(sorted(activities, key=lambda x: x['timestamp'], reverse=True))
 
+def export_response(chunks, filename):
+    """Stream an export as a download, gzip-compressed when ?gzip=1"""
+    if request.args.get('gzip') in ('1', 'true'):
+        return Response(exports.gzip_chunks(chunks), mimetype='application/gzip',
+                        headers={'Content-Disposition': f'attachment; filename={filename}.gz'})
+    return Response(chunks, mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/api/export/sensor-readings')
+def export_sensor_readings():
+    """Stream sensor readings as CSV (?format=csv) or ARGON CSV (?format=argon)"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'argon'):
+        raise QueryError('format must be csv or argon')
+    params = parse_query(request.args, ('timestamp', 'risk_score'), '-timestamp')
+    rows = sensor_readings.iter_query(exports.EXPORT_BATCH_ROWS, **params)
+    if export_format == 'argon':
+        chunks = exports.csv_chunks(exports.argon_rows(sensor_readings, rows),
+                                    exports.ARGON_HEADERS, exports.argon_comments())
+        return export_response(chunks, 'pipevision-argon-export.csv')
+    chunks = exports.csv_chunks(exports.reading_rows(sensor_readings, rows), exports.READING_HEADERS)
+    return export_response(chunks, 'pipevision-sensor-data.csv')
+
+@app.route('/api/export/risk-matrix')
+def export_risk_matrix():
+    """Stream the AI risk matrix, optionally limited to ?category= defect categories"""
+    categories = set(request.args.getlist('category'))
+    chunks = exports.csv_chunks(exports.risk_matrix_rows(iter_analyses(categories)), exports.RISK_MATRIX_HEADERS)
+    return export_response(chunks, 'pipevision-risk-matrix.csv')
+
+@app.route('/api/export/pacp-report')
+def export_pacp_report():
+    """Stream alerts with PACP codes and segment coordinates"""
+    params = parse_query(request.args, ('severity', 'timestamp'), '-severity')
+    rows = alerts.iter_query(exports.EXPORT_BATCH_ROWS, severity=request.args.get('severity') or None, **params)
+    chunks = exports.csv_chunks(exports.pacp_report_rows(rows, segment_index.get),
+                                exports.PACP_REPORT_HEADERS, exports.pacp_report_comments())
+    return export_response(chunks, 'pipevision-pacp-report.csv')
+
 @app.route('/api/pacp-codes')
+@response_cache.cached(lambda: 0)
 def get_pacp_codes():
-    """Return all PACP codes for reference"""
-    return jsonify(PACP_CODES)
+    """Return all PACP codes for reference, pre-serialized with a fixed ETag"""
+    response = Response(PACP_CODES_JSON, mimetype='application/json')
+    response.set_etag(PACP_CODES_ETAG)
+    return response
+
+@app.route('/api/_stats')
+def get_stats():
+    """Return this worker's per-route latency histograms and response cache counters"""
+    return jsonify(dict(
+        request_stats.to_dict(),
+        pid=os.getpid(),
+        cache={
+            'hits': response_cache.hits,
+            'misses': response_cache.misses,
+            'entries': len(response_cache.backend),
+            'bytes': response_cache.backend.size,
+        }
+    ))
 
 if __name__ == '__main__':
-    import os
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
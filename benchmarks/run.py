@@ -0,0 +1,273 @@
+"""Reproducible load benchmarks for the PipeVision API.
+
+Every size runs in a fresh process that builds a seeded synthetic network
+at import (PIPEVISION_SEGMENTS, PIPEVISION_READINGS, PIPEVISION_SEED), so
+startup time and peak memory are measured the way a gunicorn worker pays
+them. Each /api endpoint and export is then requested once cold and
+``--iterations`` times warm, either in-process through Flask's test client
+or over HTTP against a local gunicorn.
+
+    python benchmarks/run.py                        # 1k, 100k and 1M presets, test client
+    python benchmarks/run.py --sizes 1k,100k --iterations 200
+    python benchmarks/run.py --gunicorn --workers 4 --concurrency 8
+    python benchmarks/run.py --no-cache --output results.json
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Preset sizes as (segments, readings)
+SIZES = {
+    '1k': (100, 1_000),
+    '100k': (10_000, 100_000),
+    '1M': (100_000, 1_000_000),
+}
+
+# (name, path); every synthetic network has a pipe-1
+ENDPOINTS = [
+    ('pipe-segments', '/api/pipe-segments'),
+    ('pipe-segment', '/api/pipe-segments/pipe-1'),
+    ('bbox zoom 13', '/api/pipe-segments/bbox?bbox=-83.90,42.18,-83.59,42.38&zoom=13'),
+    ('bbox zoom 17', '/api/pipe-segments/bbox?bbox=-83.75,42.275,-83.735,42.285&zoom=17'),
+    ('history', '/api/pipe-segments/pipe-1/history?metric=soundLevel&points=500'),
+    ('rollups 1h', '/api/pipe-segments/pipe-1/rollups?resolution=1h'),
+    ('readings page', '/api/sensor-readings?limit=100'),
+    ('readings by segment', '/api/sensor-readings?segment=pipe-1&limit=100'),
+    ('readings by risk', '/api/sensor-readings?sort=-risk_score&limit=100'),
+    ('readings facets', '/api/sensor-readings/facets'),
+    ('ai-analysis', '/api/ai-analysis'),
+    ('alerts', '/api/alerts?limit=100'),
+    ('metrics', '/api/metrics'),
+    ('recent-activity', '/api/recent-activity'),
+    ('pacp-codes', '/api/pacp-codes'),
+]
+
+EXPORTS = [
+    ('export csv', '/api/export/sensor-readings?format=csv'),
+    ('export argon', '/api/export/sensor-readings?format=argon'),
+    ('export risk-matrix', '/api/export/risk-matrix'),
+    ('export pacp-report', '/api/export/pacp-report'),
+]
+
+PACP_CODES = ['CL-1', 'CL-3', 'COR-2', 'COR-4', 'DEP-1', 'RO-2', 'FR-5']
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+def summarize(name, cold, samples, size):
+    return {
+        'name': name,
+        'coldMs': round(cold, 3),
+        'p50Ms': round(percentile(samples, 50), 3),
+        'p99Ms': round(percentile(samples, 99), 3),
+        'meanMs': round(sum(samples) / len(samples), 3),
+        'bytes': size,
+    }
+
+
+def ingest_payload(rng, segments):
+    return {
+        'pipeSegmentId': f'pipe-{rng.randint(1, segments)}',
+        'pacp_code': rng.choice(PACP_CODES),
+        'temperature': round(rng.uniform(15, 35), 1),
+        'soundLevel': round(rng.uniform(35, 70), 1),
+        'flowRate': round(rng.uniform(5, 20), 2),
+    }
+
+
+def run_test_client(args):
+    """Child process: import the app, then time every endpoint in-process"""
+    sys.path.insert(0, ROOT)
+    started = time.perf_counter()
+    import app
+    startup = time.perf_counter() - started
+    client = app.app.test_client()
+    headers = {'Accept-Encoding': 'gzip'}
+
+    def fetch(path):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        size = len(response.get_data())
+        response.close()
+        return (time.perf_counter() - start) * 1000, size
+
+    results = []
+    for iterations, targets in ((args.iterations, ENDPOINTS), (args.export_iterations, EXPORTS)):
+        for name, path in targets:
+            cold, size = fetch(path)
+            samples = [fetch(path)[0] for _ in range(iterations)]
+            results.append(summarize(name, cold, samples, size))
+
+    rng = random.Random(args.seed)
+    segments = len(app.pipe_segments)
+    samples = []
+    for _ in range(args.iterations):
+        payload = ingest_payload(rng, segments)
+        start = time.perf_counter()
+        client.post('/api/sensor-readings', json=payload).close()
+        samples.append((time.perf_counter() - start) * 1000)
+    results.append(summarize('ingest reading', samples[0], samples[1:] or samples, 0))
+
+    return {
+        'startupSeconds': round(startup, 3),
+        'maxRssMb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'endpoints': results,
+        'stats': client.get('/api/_stats').get_json(),
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _tree_rss_mb(pid):
+    """Resident memory of a process and its children, from /proc (Linux)"""
+    total, pending = 0, [pid]
+    while pending:
+        pid = pending.pop()
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                total += next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+            with open(f'/proc/{pid}/task/{pid}/children') as children:
+                pending.extend(int(child) for child in children.read().split())
+        except (OSError, StopIteration):
+            continue
+    return round(total / 1024, 1)
+
+
+def run_gunicorn(args, size, env):
+    """Start a local gunicorn and time every endpoint over HTTP"""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--preload', '-w', str(args.workers), '-k', 'gthread',
+         '--threads', str(args.concurrency), '-b', f'127.0.0.1:{port}', '--timeout', '600', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+                connection.request('GET', '/api/_stats')
+                connection.getresponse().read()
+                break
+            except OSError:
+                time.sleep(0.1)
+        startup = time.perf_counter() - started
+        rss = _tree_rss_mb(server.pid)
+
+        def fetch(path, method='GET', body=None):
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+            start = time.perf_counter()
+            connection.request(method, path, body=body, headers={
+                'Accept-Encoding': 'gzip', 'Content-Type': 'application/json'})
+            size = len(connection.getresponse().read())
+            elapsed = (time.perf_counter() - start) * 1000
+            connection.close()
+            return elapsed, size
+
+        results = []
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            for iterations, targets in ((args.iterations, ENDPOINTS), (args.export_iterations, EXPORTS)):
+                for name, path in targets:
+                    cold, body_size = fetch(path)
+                    samples = [elapsed for elapsed, _ in pool.map(fetch, [path] * iterations)]
+                    results.append(summarize(name, cold, samples, body_size))
+
+            rng = random.Random(args.seed)
+            segments = SIZES[size][0]
+            bodies = [json.dumps(ingest_payload(rng, segments)) for _ in range(args.iterations)]
+            samples = [elapsed for elapsed, _ in pool.map(
+                lambda body: fetch('/api/sensor-readings', 'POST', body), bodies)]
+            results.append(summarize('ingest reading', samples[0], samples, 0))
+
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        connection.request('GET', '/api/_stats')
+        stats = json.loads(connection.getresponse().read())
+        return {
+            'startupSeconds': round(startup, 3),
+            'totalRssMb': rss,
+            'endpoints': results,
+            'stats': stats,
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(size, result):
+    memory = result.get('maxRssMb', result.get('totalRssMb'))
+    print(f"\n== {size}: startup {result['startupSeconds']:.2f} s, memory {memory} MB")
+    routes = result['stats']['routes']
+    print(f"{'endpoint':<22}{'cold ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'bytes':>12}")
+    for endpoint in result['endpoints']:
+        print(f"{endpoint['name']:<22}{endpoint['coldMs']:>10.2f}{endpoint['p50Ms']:>10.2f}"
+              f"{endpoint['p99Ms']:>10.2f}{endpoint['bytes']:>12}")
+    print(f"\n{'route (server side)':<44}{'compute':>10}{'serialize':>11}{'compress':>10}")
+    for route, stats in routes.items():
+        breakdown = stats['breakdown']
+        print(f"{route:<44}{breakdown['computeMs']:>10.2f}{breakdown['serializeMs']:>11.2f}"
+              f"{breakdown['compressMs']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(SIZES), help='comma-separated presets: ' + ', '.join(SIZES))
+    parser.add_argument('--iterations', type=int, default=100, help='warm requests per endpoint')
+    parser.add_argument('--export-iterations', type=int, default=5, help='warm requests per export')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--no-cache', action='store_true', help='disable the response cache')
+    parser.add_argument('--gunicorn', action='store_true', help='benchmark a local gunicorn over HTTP')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads (gunicorn mode)')
+    parser.add_argument('--output', help='write all results to this JSON file')
+    parser.add_argument('--size', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size:
+        # Child process for one size in test client mode
+        print(json.dumps(run_test_client(args)))
+        return
+
+    results = {}
+    for size in args.sizes.split(','):
+        segments, readings = SIZES[size]
+        env = dict(os.environ, PIPEVISION_SEGMENTS=str(segments), PIPEVISION_READINGS=str(readings),
+                   PIPEVISION_SEED=str(args.seed), PYTHONHASHSEED=str(args.seed))
+        if args.no_cache:
+            env['PIPEVISION_CACHE_MB'] = '0'
+        if args.gunicorn:
+            results[size] = run_gunicorn(args, size, env)
+        else:
+            child = subprocess.run(
+                [sys.executable, __file__, '--size', size, '--seed', str(args.seed),
+                 '--iterations', str(args.iterations), '--export-iterations', str(args.export_iterations)],
+                env=env, capture_output=True, text=True, check=True
+            )
+            results[size] = json.loads(child.stdout.splitlines()[-1])
+        report(size, results[size])
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import multiprocessing
+import uuid
+
+# Identifies this copy of the generated data. Workers forked from a preloaded
+# app inherit it (and the data); workers that import the app themselves
+# generate their own data and get their own token.
+DATASET = uuid.uuid4().hex
+
+# Version numbers come from one counter in shared memory, so two forked
+# workers mutating their copies of the data never hand out the same number
+_counter = multiprocessing.Value('Q', 0)
+
+
+def next_version():
+    """Return a new data version, unique across the workers sharing DATASET"""
+    with _counter.get_lock():
+        _counter.value += 1
+        return _counter.value
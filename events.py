@@ -0,0 +1,128 @@
+from collections import deque
+import threading
+
+# Events kept for clients that reconnect with an older sequence number
+REPLAY_BUFFER_SIZE = 1000
+
+# Events a slow subscriber may fall behind before it is disconnected
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_SECONDS = 15
+
+
+class Event:
+    __slots__ = ('seq', 'kind', 'data')
+
+    def __init__(self, seq, kind, data):
+        self.seq = seq
+        self.kind = kind
+        self.data = data
+
+    def to_sse(self):
+        return f'id: {self.seq}\nevent: {self.kind}\ndata: {self.data}\n\n'
+
+
+class Subscription:
+    """One client's bounded queue of pending events"""
+
+    def __init__(self, bus):
+        self._bus = bus
+        self._pending = deque()
+        self.overflowed = False
+
+    def _push(self, event):
+        # Backpressure: rather than buffer without bound for a slow client,
+        # drop its queue; it reconnects and catches up from the replay buffer
+        if len(self._pending) >= SUBSCRIBER_QUEUE_SIZE:
+            self.overflowed = True
+            self._pending.clear()
+        else:
+            self._pending.append(event)
+
+    def get(self, timeout=HEARTBEAT_SECONDS):
+        """Return the next batch of pending events, [] on timeout"""
+        with self._bus._changed:
+            if not self._pending and not self.overflowed:
+                self._bus._changed.wait(timeout)
+            events = list(self._pending)
+            self._pending.clear()
+            return events
+
+    def close(self):
+        self._bus._unsubscribe(self)
+
+
+class EventBus:
+    """In-process publish/subscribe bus with a bounded replay buffer.
+
+    Every event gets a monotonically increasing sequence number. Clients
+    that reconnect with ``since`` get the events they missed, as long as
+    those are still in the replay buffer; otherwise they must resync.
+    """
+
+    def __init__(self, replay_size=REPLAY_BUFFER_SIZE):
+        self._changed = threading.Condition()
+        self._replay = deque(maxlen=replay_size)
+        self._subscribers = set()
+        self.seq = 0
+
+    def publish(self, kind, data):
+        """Publish a pre-serialized JSON payload and return its sequence number"""
+        with self._changed:
+            self.seq += 1
+            event = Event(self.seq, kind, data)
+            self._replay.append(event)
+            for subscription in self._subscribers:
+                subscription._push(event)
+            self._changed.notify_all()
+            return event.seq
+
+    def subscribe(self, since=None):
+        """Return (subscription, missed_events, seq).
+
+        ``missed_events`` is None when events after ``since`` have already
+        fallen out of the replay buffer, so the client must reload its data.
+        ``seq`` is the sequence number current at subscription time.
+        """
+        with self._changed:
+            subscription = Subscription(self)
+            self._subscribers.add(subscription)
+            if since is None or since >= self.seq:
+                return subscription, [], self.seq
+            oldest = self._replay[0].seq if self._replay else self.seq + 1
+            if since + 1 < oldest:
+                return subscription, None, self.seq
+            return subscription, [e for e in self._replay if e.seq > since], self.seq
+
+    def _unsubscribe(self, subscription):
+        with self._changed:
+            self._subscribers.discard(subscription)
+
+
+def sse_stream(bus, since=None):
+    """Yield Server-Sent Events for a client, starting after ``since``.
+
+    A client that falls SUBSCRIBER_QUEUE_SIZE events behind is disconnected;
+    the browser reconnects with Last-Event-ID and is replayed from the
+    buffer, or sent a ``reset`` event if it fell out of the buffer.
+    """
+    subscription, missed, seq = bus.subscribe(since)
+    try:
+        yield 'retry: 3000\n\n'
+        if missed is None:
+            yield f'id: {seq}\nevent: reset\ndata: {{"seq": {seq}}}\n\n'
+        elif not missed:
+            yield f'id: {seq}\nevent: hello\ndata: {{"seq": {seq}}}\n\n'
+        for event in missed or ():
+            yield event.to_sse()
+        while True:
+            events = subscription.get()
+            if subscription.overflowed:
+                return
+            if not events:
+                yield ': keep-alive\n\n'
+            for event in events:
+                yield event.to_sse()
+    finally:
+        subscription.close()
@@ -0,0 +1,134 @@
+from datetime import datetime
+import csv
+import io
+import zlib
+
+# Rows written between flushes of the CSV buffer
+EXPORT_BATCH_ROWS = 1000
+
+GZIP_LEVEL = 6
+
+READING_HEADERS = ['Timestamp', 'Pipe Segment', 'PACP Code', 'PACP Score', 'Observation',
+                   'Temperature', 'Sound', 'Flow Rate', 'Risk Score', 'Camera']
+
+ARGON_HEADERS = ['Segment', 'InspectionDate', 'Inspector', 'PACP_Code', 'PACP_Score', 'Location_m',
+                 'Observation', 'Temperature_C', 'Sound_dB', 'FlowRate_Lps', 'Confidence', 'RiskScore']
+
+RISK_MATRIX_HEADERS = ['Segment', 'PACP_Code', 'PACP_Score', 'Priority', 'Confidence',
+                       'Failure_Months', 'Location_m']
+
+PACP_REPORT_HEADERS = ['Segment', 'Date', 'Severity', 'PACP_Code', 'PACP_Score', 'Message',
+                       'Confidence', 'Latitude', 'Longitude']
+
+ARGON_INSPECTOR = 'PipeVision-Robot-1'
+
+
+def csv_chunks(rows, headers, comments=()):
+    """Yield CSV text in chunks of EXPORT_BATCH_ROWS rows.
+
+    ``rows`` may be any iterable of sequences; only one chunk is held in
+    memory at a time, so output size does not affect memory use.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for comment in comments:
+        buffer.write(f'# {comment}\n')
+    writer.writerow(headers)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % EXPORT_BATCH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """Gzip-compress a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def reading_rows(store, rows):
+    for row in rows:
+        pacp = store.pacp_definition(row)
+        yield (
+            datetime.fromtimestamp(store.timestamp[row]).isoformat(),
+            store.segment_name(row),
+            pacp['code'],
+            pacp['score'],
+            pacp['description'],
+            round(store.temperature[row], 1),
+            round(store.sound_level[row], 1),
+            round(store.flow_rate[row], 2),
+            round(store.risk_score[row], 1),
+            'Yes' if store.camera_image_url(row) else 'No',
+        )
+
+
+def argon_rows(store, rows):
+    for row in rows:
+        pacp = store.pacp_definition(row)
+        yield (
+            store.segment_name(row),
+            datetime.fromtimestamp(store.timestamp[row]).date().isoformat(),
+            ARGON_INSPECTOR,
+            pacp['code'],
+            pacp['score'],
+            0,  # Would come from GPS/odometry
+            pacp['description'],
+            round(store.temperature[row], 1),
+            round(store.sound_level[row], 1),
+            round(store.flow_rate[row], 2),
+            0.85,  # Placeholder confidence
+            round(store.risk_score[row], 1),
+        )
+
+
+def argon_comments():
+    return [
+        'PipeVision AI - PACP 7.0 Compliant Export',
+        'Generated: ' + datetime.now().isoformat(),
+        'Format: ARGON Compatible',
+    ]
+
+
+def risk_matrix_rows(analyses):
+    for a in analyses:
+        yield (
+            a['pipeSegmentName'],
+            a['pacp_code'],
+            a['pacp_score'],
+            a['maintenancePriority'],
+            f"{a['corrosionConfidence'] * 100:.2f}",
+            a['predictedFailureMonths'],
+            a['defect_location_meters'],
+        )
+
+
+def pacp_report_rows(alerts, segment_lookup):
+    for alert in alerts:
+        segment = segment_lookup(alert['pipeSegmentId'])
+        yield (
+            alert['pipeSegmentName'],
+            alert['timestamp'][:10],
+            alert['severity'],
+            alert['pacp_code'],
+            alert['pacp_score'],
+            alert['message'],
+            f"{alert['confidence'] * 100:.2f}",
+            segment['latitude'] if segment else '',
+            segment['longitude'] if segment else '',
+        )
+
+
+def pacp_report_comments():
+    return [
+        'PipeVision PACP Report',
+        'Generated: ' + datetime.now().isoformat(),
+        'PACP 7.0 Compliant',
+    ]
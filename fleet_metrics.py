@@ -0,0 +1,98 @@
+from data_version import next_version
+
+QUALITY_LEVELS = ['Great', 'Good', 'Fair', 'Poor']
+
+# (label, lower bound inclusive, upper bound exclusive) in years
+AGE_BUCKETS = [
+    ('0-10 years', 0, 10),
+    ('10-20 years', 10, 20),
+    ('20-30 years', 20, 30),
+    ('30+ years', 30, None),
+]
+
+
+def age_bucket(age):
+    for i, (_, low, high) in enumerate(AGE_BUCKETS):
+        if age >= low and (high is None or age < high):
+            return i
+    return 0
+
+
+class FleetMetrics:
+    """Running fleet-wide totals and histograms over pipe segments.
+
+    Each segment's contribution is remembered so that adding, updating or
+    removing a segment adjusts the aggregates in O(1) instead of re-scanning
+    the fleet on every /api/metrics call.
+    """
+
+    def __init__(self, segments=()):
+        self.total_length = 0
+        self.total_age = 0
+        self.quality_counts = {quality: 0 for quality in QUALITY_LEVELS}
+        self.pipe_type_counts = {}
+        self.age_counts = [0] * len(AGE_BUCKETS)
+        self._contributions = {}
+        self.version = next_version()
+        for segment in segments:
+            self.add(segment)
+
+    def __len__(self):
+        return len(self._contributions)
+
+    def add(self, segment):
+        """Add a new segment, or replace the existing one with the same id"""
+        if segment['id'] in self._contributions:
+            self.remove(segment['id'])
+        contribution = (
+            segment['lengthMeters'],
+            segment['estimatedAge'],
+            segment['quality'],
+            segment['pipeType'],
+        )
+        self._apply(contribution, 1)
+        self._contributions[segment['id']] = contribution
+        self.version = next_version()
+
+    update = add
+
+    def remove(self, segment_id):
+        self._apply(self._contributions.pop(segment_id), -1)
+        self.version = next_version()
+
+    def _apply(self, contribution, sign):
+        length, age, quality, pipe_type = contribution
+        self.total_length += sign * length
+        self.total_age += sign * age
+        self.quality_counts[quality] = self.quality_counts.get(quality, 0) + sign
+        self.pipe_type_counts[pipe_type] = self.pipe_type_counts.get(pipe_type, 0) + sign
+        if not self.pipe_type_counts[pipe_type]:
+            del self.pipe_type_counts[pipe_type]
+        self.age_counts[age_bucket(age)] += sign
+
+    @property
+    def high_risk_segments(self):
+        return self.quality_counts['Poor']
+
+    @property
+    def average_quality(self):
+        """Most common quality level across the fleet"""
+        if not self._contributions:
+            return None
+        return max(QUALITY_LEVELS, key=lambda quality: self.quality_counts[quality])
+
+    def to_dict(self):
+        count = len(self._contributions)
+        return {
+            'totalPipeLength': self.total_length,
+            'averageAge': round(self.total_age / count, 1) if count else 0,
+            'averageQuality': self.average_quality,
+            'qualityDistribution': dict(self.quality_counts),
+            'qualityBreakdown': {quality.lower(): n for quality, n in self.quality_counts.items()},
+            'pipeTypeBreakdown': dict(self.pipe_type_counts),
+            'ageDistribution': [
+                {'range': label, 'count': self.age_counts[i]}
+                for i, (label, _, _) in enumerate(AGE_BUCKETS)
+            ],
+            'highRiskSegments': self.high_risk_segments,
+        }
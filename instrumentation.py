@@ -0,0 +1,134 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import resource
+import threading
+import time
+
+from flask import g, has_request_context
+from flask.json.provider import DefaultJSONProvider
+
+# Upper bounds (ms) of the latency histogram buckets; a final bucket
+# catches everything slower
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Request phases timed separately from the total; whatever is left is compute
+PHASES = ('serialize', 'compress')
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with estimated percentiles"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, q):
+        """Estimate the q-th percentile (0-100), interpolating within its bucket"""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = self.bounds[i - 1] if i else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                return round(min(low + (high - low) * (rank - seen) / n, self.max), 3)
+            seen += n
+        return round(self.max, 3)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'meanMs': round(self.total / self.count, 3) if self.count else None,
+            'p50Ms': self.percentile(50),
+            'p90Ms': self.percentile(90),
+            'p99Ms': self.percentile(99),
+            'maxMs': round(self.max, 3),
+            'buckets': [
+                {'le': bound, 'count': n}
+                for bound, n in zip(self.bounds + ('+Inf',), self.counts)
+            ],
+        }
+
+
+class RouteStats:
+    """Latency histogram and phase totals for one route"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.phase_ms = dict.fromkeys(PHASES, 0.0)
+        self.bytes = 0
+
+    def to_dict(self):
+        count = self.latency.count or 1
+        serialize, compress = (self.phase_ms[phase] / count for phase in PHASES)
+        return dict(
+            self.latency.to_dict(),
+            breakdown={
+                'computeMs': round(max(self.latency.total / count - serialize - compress, 0.0), 3),
+                'serializeMs': round(serialize, 3),
+                'compressMs': round(compress, 3),
+            },
+            meanBytes=round(self.bytes / count),
+        )
+
+
+class RequestStats:
+    """Per-route request timings for this worker process"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.startup_seconds = None
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, ms, phases, size):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = RouteStats()
+            stats.latency.observe(ms)
+            for phase, value in phases.items():
+                stats.phase_ms[phase] += value
+            stats.bytes += size
+
+    def to_dict(self):
+        with self._lock:
+            routes = {route: stats.to_dict() for route, stats in sorted(self._routes.items())}
+        return {
+            'uptimeSeconds': round(time.time() - self.started, 1),
+            'startupSeconds': self.startup_seconds,
+            'maxRssMb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'routes': routes,
+        }
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to the current request's ``phase``"""
+    if not has_request_context() or 'phase_ms' not in g:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.phase_ms[phase] += (time.perf_counter() - start) * 1000
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider that counts ``jsonify`` time as serialization"""
+
+    def dumps(self, obj, **kwargs):
+        with timed('serialize'):
+            return super().dumps(obj, **kwargs)
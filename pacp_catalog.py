@@ -0,0 +1,104 @@
+from array import array
+import hashlib
+import json
+import random
+
+# PACP defect code mappings (compliant with PACP 7.0)
+PACP_CODES = {
+    'corrosion': [
+        {'code': 'COR-1', 'name': 'Light Corrosion', 'score': 1, 'description': 'Surface oxidation visible'},
+        {'code': 'COR-2', 'name': 'Moderate Corrosion', 'score': 2, 'description': 'Material thinning <10%'},
+        {'code': 'COR-3', 'name': 'Medium Corrosion', 'score': 3, 'description': 'Material thinning 10-30%'},
+        {'code': 'COR-4', 'name': 'Severe Corrosion', 'score': 4, 'description': 'Material thinning 30-50%'},
+        {'code': 'COR-5', 'name': 'Critical Corrosion', 'score': 5, 'description': 'Material thinning >50%'},
+    ],
+    'crack': [
+        {'code': 'CL-1', 'name': 'Hairline Longitudinal Crack', 'score': 1, 'description': 'Width <1mm'},
+        {'code': 'CL-2', 'name': 'Minor Longitudinal Crack', 'score': 2, 'description': 'Width 1-3mm'},
+        {'code': 'CL-3', 'name': 'Medium Longitudinal Crack', 'score': 3, 'description': 'Width 3-10mm'},
+        {'code': 'CL-4', 'name': 'Severe Longitudinal Crack', 'score': 4, 'description': 'Width >10mm'},
+        {'code': 'CL-5', 'name': 'Critical Longitudinal Crack', 'score': 5, 'description': 'Structural failure'},
+        {'code': 'CR-1', 'name': 'Hairline Circumferential Crack', 'score': 1, 'description': 'Width <1mm'},
+        {'code': 'CR-2', 'name': 'Minor Circumferential Crack', 'score': 2, 'description': 'Width 1-3mm'},
+        {'code': 'CR-3', 'name': 'Medium Circumferential Crack', 'score': 3, 'description': 'Width 3-10mm'},
+        {'code': 'FR-4', 'name': 'Severe Fracture', 'score': 4, 'description': 'Pipe segments separated'},
+        {'code': 'FR-5', 'name': 'Critical Fracture', 'score': 5, 'description': 'Complete structural failure'},
+    ],
+    'deposit': [
+        {'code': 'DEP-1', 'name': 'Light Deposits', 'score': 1, 'description': 'Coverage <20%'},
+        {'code': 'DEP-2', 'name': 'Moderate Deposits', 'score': 2, 'description': 'Coverage 20-50%'},
+        {'code': 'DEP-3', 'name': 'Heavy Deposits', 'score': 3, 'description': 'Coverage >50%'},
+    ],
+    'root': [
+        {'code': 'RO-1', 'name': 'Fine Roots', 'score': 1, 'description': 'Fine root hairs'},
+        {'code': 'RO-2', 'name': 'Tap Root', 'score': 2, 'description': 'Single root penetration'},
+        {'code': 'RO-3', 'name': 'Medium Root Mass', 'score': 3, 'description': 'Multiple roots, flow restricted'},
+        {'code': 'RO-4', 'name': 'Severe Root Intrusion', 'score': 4, 'description': 'Heavy root mass, blockage'},
+    ],
+    'deformation': [
+        {'code': 'DEF-1', 'name': 'Minor Deformation', 'score': 1, 'description': '<5% diameter change'},
+        {'code': 'DEF-2', 'name': 'Moderate Deformation', 'score': 2, 'description': '5-10% diameter change'},
+        {'code': 'DEF-3', 'name': 'Severe Deformation', 'score': 3, 'description': '>10% diameter change'},
+    ]
+}
+
+DEFECT_CATEGORIES = ['corrosion', 'crack', 'deposit', 'root', 'deformation']
+
+# Severity bands used when picking representative codes: (min score, max score)
+SEVERITY_BANDS = {
+    'critical': (4, 5),
+    'high': (3, 4),
+    'low': (1, 2),
+}
+
+# Lookup tables, built once at import. Readings and analyses store only the
+# code (readings as its integer id) and resolve the rest through these.
+
+# Every code definition in catalogue order; a code's position is its id
+CODES = [definition for category in DEFECT_CATEGORIES for definition in PACP_CODES[category]]
+CODE_IDS = {definition['code']: i for i, definition in enumerate(CODES)}
+BY_CODE = {definition['code']: definition for definition in CODES}
+CATEGORY_OF = {definition['code']: category for category in DEFECT_CATEGORIES for definition in PACP_CODES[category]}
+# Category, score and severity band -> codes, in catalogue order
+BY_CATEGORY = {category: [definition['code'] for definition in PACP_CODES[category]] for category in DEFECT_CATEGORIES}
+BY_SCORE = {
+    score: [definition['code'] for definition in CODES if definition['score'] == score]
+    for score in sorted({definition['score'] for definition in CODES})
+}
+BY_SEVERITY = {
+    band: [definition['code'] for definition in CODES if low <= definition['score'] <= high]
+    for band, (low, high) in SEVERITY_BANDS.items()
+}
+
+# PACP score by code id, for vectorized lookups over a column of ids
+SCORES = array('B', (definition['score'] for definition in CODES))
+
+# Pre-encoded JSON members of a sensor reading, by code id
+READING_FIELDS_JSON = [
+    f'"pacp_code":{json.dumps(d["code"])},"pacp_name":{json.dumps(d["name"])},'
+    f'"pacp_score":{d["score"]},"observation":{json.dumps(d["description"])}'
+    for d in CODES
+]
+
+# /api/pacp-codes body, serialized once, and its ETag
+PACP_CODES_JSON = json.dumps(PACP_CODES, sort_keys=True, separators=(',', ':')).encode('utf-8')
+PACP_CODES_ETAG = hashlib.sha1(PACP_CODES_JSON).hexdigest()
+
+
+def get_random_pacp_code(severity='random'):
+    """Get a random PACP code based on severity"""
+    if severity == 'random':
+        category = random.choice(DEFECT_CATEGORIES)
+        return random.choice(PACP_CODES[category])
+    return BY_CODE[random.choice(BY_SEVERITY.get(severity, BY_SEVERITY['low']))]
+
+
+def expand_analysis(analysis):
+    """Return an analysis with its PACP name, score and description filled in"""
+    definition = BY_CODE[analysis['pacp_code']]
+    return dict(
+        analysis,
+        pacp_name=definition['name'],
+        pacp_score=definition['score'],
+        pacp_description=definition['description']
+    )
@@ -0,0 +1,114 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+import heapq
+
+# Largest page a client may request with ?limit=
+MAX_PAGE_SIZE = 1000
+
+
+class QueryError(ValueError):
+    """Raised for malformed filter, sort or cursor parameters"""
+
+
+def parse_query(args, sort_keys, default_sort):
+    """Parse the shared filter/sort/pagination query parameters.
+
+    ``sort_keys`` lists the sortable fields; prefix a key with ``-`` in the
+    request for descending order.
+    """
+    sort = args.get('sort', default_sort)
+    if sort.lstrip('-') not in sort_keys:
+        raise QueryError(f"sort must be one of {', '.join(sort_keys)} (prefix with - for descending)")
+
+    return {
+        'segment': args.get('segment') or None,
+        'pacp_code': args.get('pacp_code') or None,
+        'min_score': _number(args, 'min_score'),
+        'max_score': _number(args, 'max_score'),
+        'since': _datetime(args, 'since'),
+        'until': _datetime(args, 'until'),
+        'sort': sort,
+        'limit': _limit(args),
+        'cursor': _cursor(args),
+    }
+
+
+def page(sources, key, limit=None, cursor=None, reverse=False, predicate=None, lo=None, hi=None):
+    """Walk key-sorted row sources and return (rows, next_cursor).
+
+    Each source must already be sorted ascending by ``key``. The walk starts
+    just past ``cursor`` (the last row of the previous page), is clipped to
+    ``lo <= key < hi`` by binary search, and stops after ``limit`` matching
+    rows, so a page costs time proportional to its size rather than to the
+    size of the sources.
+    """
+    walkers = []
+    for source in sources:
+        start = 0 if lo is None else bisect_left(source, lo, key=key)
+        end = len(source) if hi is None else bisect_left(source, hi, key=key)
+        if cursor is not None:
+            if reverse:
+                end = min(end, bisect_left(source, key(cursor), key=key))
+            else:
+                start = max(start, bisect_right(source, key(cursor), key=key))
+        if start < end:
+            walkers.append(_walk(source, start, end, reverse))
+    if not walkers:
+        return [], None
+
+    merged = walkers[0] if len(walkers) == 1 else heapq.merge(*walkers, key=key, reverse=reverse)
+    rows = []
+    for row in merged:
+        if predicate is not None and not predicate(row):
+            continue
+        if limit is not None and len(rows) == limit:
+            return rows, rows[-1]
+        rows.append(row)
+    return rows, None
+
+
+def _walk(source, start, end, reverse):
+    if reverse:
+        for i in range(end - 1, start - 1, -1):
+            yield source[i]
+    else:
+        for i in range(start, end):
+            yield source[i]
+
+
+def _number(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise QueryError(f'{name} must be a number')
+
+
+def _datetime(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise QueryError(f'{name} must be an ISO 8601 timestamp')
+
+
+def _limit(args):
+    value = args.get('limit')
+    if value in (None, ''):
+        return None
+    if not value.isdigit() or not 0 < int(value) <= MAX_PAGE_SIZE:
+        raise QueryError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return int(value)
+
+
+def _cursor(args):
+    value = args.get('cursor')
+    if value in (None, ''):
+        return None
+    if not value.isdigit():
+        raise QueryError('cursor is not valid')
+    return int(value)
@@ -0,0 +1,315 @@
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+import json
+
+import pacp_catalog
+from data_version import next_version
+from query import QueryError, page
+
+# Rows serialized per chunk when streaming JSON
+JSON_CHUNK_ROWS = 500
+
+
+class ValueDictionary:
+    """Dictionary-encode repeated values (segment ids, PACP codes) as small ints"""
+
+    def __init__(self):
+        self._codes = {}
+        self._values = []
+        self._encoded = []
+
+    def encode(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._values)
+            self._codes[value] = code
+            self._values.append(value)
+            # Cache the JSON form so serialization never re-encodes strings
+            self._encoded.append(json.dumps(value))
+        return code
+
+    def lookup(self, value):
+        """Return the code for value, or None if it has never been seen"""
+        return self._codes.get(value)
+
+    def decode(self, code):
+        return self._values[code]
+
+    def decode_json(self, code):
+        return self._encoded[code]
+
+    def __len__(self):
+        return len(self._values)
+
+
+class ReadingStore:
+    """Columnar, append-only store for sensor readings.
+
+    Numeric fields live in typed ``array`` columns and string fields are
+    dictionary-encoded, so a reading costs a few dozen bytes instead of a
+    13-key dict. PACP codes are stored as catalogue ids; their name, score
+    and description are resolved through ``pacp_catalog``. Rows are
+    addressed by their insertion index.
+    """
+
+    def __init__(self):
+        self.timestamp = array('d')
+        self.temperature = array('f')
+        self.sound_level = array('f')
+        self.flow_rate = array('f')
+        self.risk_score = array('f')
+
+        self.segment_code = array('I')
+        self.pacp_code = array('H')
+        self.camera_code = array('H')
+
+        self.segments = ValueDictionary()
+        self.cameras = ValueDictionary()
+
+        # Per-code side tables for values that are fully determined by the code
+        self._segment_names = []
+        self._segment_names_json = []
+        self._segment_max_pacp = array('B')
+
+        # Secondary indexes: row indices ordered by (timestamp, row) overall,
+        # per segment and per PACP code, plus one ordered by (risk_score, row)
+        self._time_order = array('I')
+        self._by_segment = {}
+        self._by_pacp = {}
+        self._risk_order = array('I')
+
+        # Bumped on every mutation; response caches key on it. The map only
+        # depends on each segment's worst PACP score, which has its own
+        # version so live ingest does not invalidate every viewport.
+        self.version = next_version()
+        self.max_pacp_version = self.version
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def append(self, segment_id, segment_name, timestamp, temperature, sound_level,
+               flow_rate, pacp_code, risk_score, camera_image_url=None):
+        """Append one reading and return its row index.
+
+        ``timestamp`` is a datetime or POSIX seconds; ``pacp_code`` is a code
+        from the PACP catalogue.
+        """
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+
+        row = len(self.timestamp)
+
+        # Resolve and encode everything first, so a bad value raises before
+        # any column grows and the columns stay the same length
+        code = pacp_catalog.CODE_IDS[pacp_code]
+        score = pacp_catalog.SCORES[code]
+        camera = self.cameras.encode(camera_image_url)
+        segment = self.segments.encode(segment_id)
+        if segment == len(self._segment_names):
+            self._segment_names.append(segment_name)
+            self._segment_names_json.append(json.dumps(segment_name))
+            self._segment_max_pacp.append(0)
+            self.max_pacp_version = next_version()
+        if score > self._segment_max_pacp[segment]:
+            self._segment_max_pacp[segment] = score
+            self.max_pacp_version = next_version()
+
+        self.timestamp.append(timestamp)
+        self.temperature.append(temperature)
+        self.sound_level.append(sound_level)
+        self.flow_rate.append(flow_rate)
+        self.risk_score.append(risk_score)
+        self.segment_code.append(segment)
+        self.pacp_code.append(code)
+        self.camera_code.append(camera)
+
+        # Live ingest arrives in time order, so these are normally O(1) appends
+        _insert(self._time_order, row, self._time_key)
+        _insert(self._by_segment.setdefault(segment, array('I')), row, self._time_key)
+        _insert(self._by_pacp.setdefault(code, array('I')), row, self._time_key)
+        _insert(self._risk_order, row, self._risk_key)
+        self.version = next_version()
+        return row
+
+    def _time_key(self, row):
+        return (self.timestamp[row], row)
+
+    def _risk_key(self, row):
+        return (self.risk_score[row], row)
+
+    def time_range(self, start=None, end=None):
+        """Return row indices with start <= timestamp < end, oldest first"""
+        rows, _ = page([self._time_order], self._time_key, lo=_time_bound(start), hi=_time_bound(end))
+        return array('I', rows)
+
+    def segment_rows(self, segment_id):
+        """Return row indices for one pipe segment, oldest reading first"""
+        segment = self.segments.lookup(segment_id)
+        if segment is None:
+            return array('I')
+        return self._by_segment[segment]
+
+    def segment_time_range(self, segment_id, start=None, end=None, limit=None):
+        """Return up to ``limit`` of one segment's row indices with start <= timestamp < end, oldest first"""
+        segment = self.segments.lookup(segment_id)
+        if segment is None:
+            return array('I')
+        rows, _ = page([self._by_segment[segment]], self._time_key, limit=limit,
+                       lo=_time_bound(start), hi=_time_bound(end))
+        return array('I', rows)
+
+    def max_pacp_score(self, segment_id):
+        """Return the worst PACP score seen for a segment, or None"""
+        segment = self.segments.lookup(segment_id)
+        return None if segment is None else self._segment_max_pacp[segment]
+
+    def match_segments(self, term):
+        """Return segment codes whose id equals term or whose name contains it"""
+        term = term.lower()
+        return [
+            code for code, name in enumerate(self._segment_names)
+            if term in name.lower() or self.segments.decode(code) == term
+        ]
+
+    def pacp_facets(self):
+        """Return the distinct PACP codes with their reading counts"""
+        return sorted(
+            ({'code': pacp_catalog.CODES[code]['code'], 'count': len(rows)} for code, rows in self._by_pacp.items()),
+            key=lambda facet: facet['code']
+        )
+
+    def query(self, segment=None, pacp_code=None, min_score=None, max_score=None,
+              since=None, until=None, sort='-timestamp', limit=None, cursor=None):
+        """Return (rows, next_cursor) for one filtered, sorted page.
+
+        ``segment`` matches a segment id or part of a segment name,
+        ``min_score``/``max_score`` bound risk_score, and ``cursor`` is the
+        last row of the previous page. The narrowest of the segment, PACP and
+        time indexes drives the walk; the remaining filters are checked per row.
+        """
+        if cursor is not None and not 0 <= cursor < len(self):
+            raise QueryError('cursor is not valid')
+
+        segment_codes = segment_sources = pacp = pacp_source = None
+        if segment is not None:
+            segment_codes = set(self.match_segments(segment))
+            segment_sources = [self._by_segment[code] for code in segment_codes]
+        if pacp_code is not None:
+            pacp = pacp_catalog.CODE_IDS.get(pacp_code)
+            pacp_source = self._by_pacp.get(pacp, array('I'))
+
+        # Drive the walk from the narrowest index and check the others per row
+        check_segment = check_pacp = False
+        if segment_sources is not None and (
+                pacp_source is None or sum(map(len, segment_sources)) <= len(pacp_source)):
+            sources = segment_sources
+            check_pacp = pacp_source is not None
+        elif pacp_source is not None:
+            sources = [pacp_source]
+            check_segment = segment_sources is not None
+        else:
+            sources = None
+
+        def predicate(row):
+            if check_pacp and self.pacp_code[row] != pacp:
+                return False
+            if check_segment and self.segment_code[row] not in segment_codes:
+                return False
+            if min_score is not None and self.risk_score[row] < min_score:
+                return False
+            if max_score is not None and self.risk_score[row] > max_score:
+                return False
+            return True
+
+        reverse = sort.startswith('-')
+        lo, hi = _time_bound(since), _time_bound(until)
+        if sort.lstrip('-') == 'timestamp':
+            if sources is None:
+                sources = [self._time_order]
+            return page(sources, self._time_key, limit, cursor, reverse, predicate, lo=lo, hi=hi)
+
+        # Sorting by risk: walk the global risk index, or sort the filtered
+        # candidates, which are bounded by the size of the index that found
+        # them. Either way the score range is clipped by binary search.
+        risk_lo = None if min_score is None else (min_score, -1)
+        risk_hi = None if max_score is None else (max_score, float('inf'))
+        if sources is not None:
+            window, _ = page(sources, self._time_key, lo=lo, hi=hi)
+            return page([sorted(window, key=self._risk_key)], self._risk_key, limit, cursor,
+                        reverse, predicate, lo=risk_lo, hi=risk_hi)
+
+        def windowed(row):
+            key = self._time_key(row)
+            if (lo is not None and key < lo) or (hi is not None and key >= hi):
+                return False
+            return predicate(row)
+
+        return page([self._risk_order], self._risk_key, limit, cursor, reverse, windowed,
+                    lo=risk_lo, hi=risk_hi)
+
+    def iter_query(self, batch_size, **params):
+        """Yield every row matching a query, one page at a time"""
+        params = dict(params, limit=batch_size)
+        while True:
+            rows, cursor = self.query(**params)
+            yield from rows
+            if cursor is None:
+                return
+            params['cursor'] = cursor
+
+    def reading_id(self, row):
+        return f'reading-{row + 1}'
+
+    def segment_name(self, row):
+        return self._segment_names[self.segment_code[row]]
+
+    def pacp_definition(self, row):
+        """Return the catalogue definition of a row's PACP observation"""
+        return pacp_catalog.CODES[self.pacp_code[row]]
+
+    def pacp_score(self, row):
+        return pacp_catalog.SCORES[self.pacp_code[row]]
+
+    def camera_image_url(self, row):
+        return self.cameras.decode(self.camera_code[row])
+
+    def row_json(self, row):
+        """Serialize one row straight from the columns"""
+        segment = self.segment_code[row]
+        return (
+            f'{{"id":"{self.reading_id(row)}",'
+            f'"pipeSegmentId":{self.segments.decode_json(segment)},'
+            f'"pipeSegmentName":{self._segment_names_json[segment]},'
+            f'"timestamp":"{datetime.fromtimestamp(self.timestamp[row]).isoformat()}",'
+            f'"temperature":{round(self.temperature[row], 1)},'
+            f'"soundLevel":{round(self.sound_level[row], 1)},'
+            f'"flowRate":{round(self.flow_rate[row], 2)},'
+            f'"cameraImageUrl":{self.cameras.decode_json(self.camera_code[row])},'
+            f'{pacp_catalog.READING_FIELDS_JSON[self.pacp_code[row]]},'
+            f'"risk_score":{round(self.risk_score[row], 1)}}}'
+        )
+
+    def iter_json(self, rows):
+        """Yield a JSON array of the given rows in chunks"""
+        yield '['
+        for start in range(0, len(rows), JSON_CHUNK_ROWS):
+            chunk = ','.join(self.row_json(row) for row in rows[start:start + JSON_CHUNK_ROWS])
+            yield ',' + chunk if start else chunk
+        yield ']'
+
+
+def _insert(order, row, key):
+    """Insert row into an index kept sorted by key"""
+    if not order or key(order[-1]) <= key(row):
+        order.append(row)
+    else:
+        order.insert(bisect_right(order, key(row), key=key), row)
+
+
+def _time_bound(value):
+    """Key that sorts before every row at the given time"""
+    if value is None:
+        return None
+    seconds = value.timestamp() if isinstance(value, datetime) else value
+    return (seconds, -1)
@@ -0,0 +1,283 @@
+from collections import OrderedDict
+from functools import wraps
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import data_version
+from instrumentation import timed
+
+# Default memory cap for cached bodies, all encodings included
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Response headers stored with a cached body
+CACHED_HEADERS = ('Content-Type', 'X-Next-Cursor')
+
+# SQLite hits are recorded in memory and written back in one transaction
+# once this many are pending or the oldest is this many seconds old
+TOUCH_BATCH = 256
+TOUCH_INTERVAL_SECONDS = 5.0
+
+
+class MemoryBackend:
+    """Per-process LRU of cache entries, bounded by total body size"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if len(entry[2]) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[2])
+            self._entries[key] = entry
+            self.size += len(entry[2])
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted[2])
+
+
+class SqliteBackend:
+    """LRU cache in a SQLite file, shared by every worker that opens it.
+
+    Eviction removes the least recently used entries once the stored bodies
+    exceed ``max_bytes``. Hits update ``used`` in batches, so reads do not
+    take the write lock. Any SQLite error (a locked or corrupt file, a full
+    disk) counts as a miss or a skipped store instead of failing the request.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._touched = {}
+        self._touched_since = None
+        self._touch_lock = threading.Lock()
+        self._connection().executescript(
+            'PRAGMA journal_mode=WAL;'
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY, etag TEXT, headers TEXT, body BLOB,'
+            ' size INTEGER, used REAL);'
+            'CREATE INDEX IF NOT EXISTS entries_used ON entries (used);'
+        )
+
+    def _connection(self):
+        # One connection per thread, reopened in forked workers: a SQLite
+        # connection must not be used across fork()
+        pid, connection = getattr(self._local, 'connection', (None, None))
+        if pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = (os.getpid(), connection)
+        return connection
+
+    def __len__(self):
+        try:
+            return self._connection().execute('SELECT count(*) FROM entries').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    @property
+    def size(self):
+        try:
+            return self._connection().execute('SELECT total(size) FROM entries').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def get(self, key):
+        try:
+            row = self._connection().execute(
+                'SELECT etag, headers, body FROM entries WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        self._touch(key)
+        return row[0], json.loads(row[1]), row[2]
+
+    def _touch(self, key):
+        now = time.time()
+        with self._touch_lock:
+            self._touched[key] = now
+            if self._touched_since is None:
+                self._touched_since = now
+            if len(self._touched) < TOUCH_BATCH and now - self._touched_since < TOUCH_INTERVAL_SECONDS:
+                return
+            touched, self._touched, self._touched_since = self._touched, {}, None
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                self._write_touches(connection, touched)
+        except sqlite3.Error:
+            pass
+
+    def _write_touches(self, connection, touched):
+        connection.executemany('UPDATE entries SET used = ? WHERE key = ?',
+                               [(used, key) for key, used in touched.items()])
+
+    def put(self, key, entry):
+        etag, headers, body = entry
+        if len(body) > self.max_bytes:
+            return
+        try:
+            self._store(key, etag, headers, body)
+        except sqlite3.Error:
+            pass
+
+    def _store(self, key, etag, headers, body):
+        # Pending hits are written first so eviction sees recent use
+        with self._touch_lock:
+            touched, self._touched, self._touched_since = self._touched, {}, None
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            self._write_touches(connection, touched)
+            connection.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                (key, etag, json.dumps(headers), body, len(body), time.time())
+            )
+            excess = connection.execute('SELECT total(size) FROM entries').fetchone()[0] - self.max_bytes
+            if excess <= 0:
+                return
+            for evict_key, size in connection.execute('SELECT key, size FROM entries ORDER BY used').fetchall():
+                connection.execute('DELETE FROM entries WHERE key = ?', (evict_key,))
+                excess -= size
+                if excess <= 0:
+                    break
+
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)
+
+
+class ResponseCache:
+    """Serialized (and compressed) API responses keyed on data versions.
+
+    A cached view is keyed on its path, its query string and the version
+    its ``version`` callable returns, so a mutation that bumps the version
+    makes the next request rebuild the body and older entries simply age
+    out of the LRU. Each encoding of a body is stored as its own entry.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache from PIPEVISION_CACHE_DIR and PIPEVISION_CACHE_MB.
+
+        With a cache directory the entries live in a SQLite file shared by
+        all gunicorn workers; otherwise each worker keeps its own in memory.
+        """
+        max_bytes = int(float(os.environ.get('PIPEVISION_CACHE_MB', DEFAULT_MAX_BYTES / 2**20)) * 2**20)
+        directory = os.environ.get('PIPEVISION_CACHE_DIR')
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            return cls(SqliteBackend(os.path.join(directory, 'responses.sqlite3'), max_bytes))
+        return cls(MemoryBackend(max_bytes))
+
+    def cached(self, version):
+        """Decorate a GET view whose body depends only on ``version()`` and the request URL"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Read the version before building the body: a mutation that
+                # lands meanwhile moves later requests to a new key
+                key = '|'.join((
+                    data_version.DATASET,
+                    str(version()),
+                    request.path,
+                    urlencode(sorted(request.args.items(multi=True))),
+                ))
+                encoding = self._negotiate()
+                entry = self.backend.get(f'{key}|{encoding}')
+                if entry is not None:
+                    self.hits += 1
+                    return self._respond(entry)
+                entry, response = self._fill(key, encoding, view, args, kwargs)
+                return response if entry is None else self._respond(entry)
+            return wrapper
+        return decorator
+
+    def _negotiate(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return 'identity'
+
+    def _fill(self, key, encoding, view, args, kwargs):
+        """Build and store the entry for one encoding.
+
+        Returns (entry, None), or (None, response) when the view's response
+        is not cacheable (an error status, a streamed body, or not a Response
+        object). Streamed bodies are passed through rather than drained into
+        memory.
+        """
+        identity = self.backend.get(f'{key}|identity')
+        if identity is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            response = view(*args, **kwargs)
+            if not isinstance(response, Response) or response.status_code != 200 or response.is_streamed:
+                return None, response
+            body = response.get_data()
+            headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+            etag = response.get_etag()[0] or hashlib.blake2b(body, digest_size=16).hexdigest()
+            identity = (etag, headers, body)
+            self.backend.put(f'{key}|identity', identity)
+        etag, headers, body = identity
+        if encoding == 'identity' or len(body) < COMPRESS_MIN_BYTES:
+            return identity, None
+        with timed('compress'):
+            compressed = _compress(body, encoding)
+        entry = (f'{etag}-{encoding}', dict(headers, **{'Content-Encoding': encoding}), compressed)
+        self.backend.put(f'{key}|{encoding}', entry)
+        return entry, None
+
+    def _respond(self, entry):
+        etag, headers, body = entry
+        response = Response(body, headers=headers)
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        return response.make_conditional(request)
@@ -0,0 +1,150 @@
+import numpy as np
+
+from pacp_catalog import SCORES
+
+# Most recent readings per segment that feed its score
+RECENT_READINGS = 20
+
+# Relative corrosion/wear susceptibility by pipe material
+MATERIAL_FACTOR = {'Concrete': 1.0, 'Clay': 1.1, 'PVC': 0.5, 'HDPE': 0.4}
+DEFAULT_MATERIAL_FACTOR = 0.8
+
+# Prior risk implied by the segment's last inspection grade
+QUALITY_PRIOR = {'Great': 0.05, 'Good': 0.2, 'Fair': 0.5, 'Poor': 0.85}
+
+# Upper risk bound (exclusive) for each corrosion level; anything above is Critical
+CORROSION_LEVELS = [(0.25, 'None'), (0.4, 'Low'), (0.55, 'Medium'), (0.7, 'High')]
+
+# Lower risk bound (inclusive) for each maintenance priority, most urgent first
+PRIORITIES = [(0.65, 'Critical'), (0.45, 'High'), (0.35, 'Medium'), (0.0, 'Low')]
+
+# Baseline sound level (dB) and span over which it maps to full hydraulic stress
+SOUND_BASELINE = 45.0
+SOUND_SPAN = 30.0
+
+def score_arrays(age, diameter, material, prior, count, pacp, sound, flow):
+    """Score a batch of segments; every argument is a NumPy array over segments.
+
+    ``pacp``, ``sound`` and ``flow`` are (segments, RECENT_READINGS) matrices
+    of recent readings padded with NaN. Returns (risk, confidence), both in
+    0..1.
+    """
+    has_readings = count > 0
+    n = np.maximum(count, 1)
+    pacp_mean = np.nansum(pacp, axis=1) / n
+    pacp_max = np.max(np.nan_to_num(pacp, nan=0.0), axis=1)
+    sound_mean = np.nansum(sound, axis=1) / n
+    flow_mean = np.nansum(flow, axis=1) / n
+    flow_std = np.sqrt(np.nansum((flow - flow_mean[:, None]) ** 2, axis=1) / n)
+
+    defect = np.where(has_readings, 0.6 * pacp_max / 5 + 0.4 * pacp_mean / 5, prior)
+    wear = np.clip(age / 60 * material, 0, 1)
+    hydraulic = np.where(
+        has_readings,
+        0.5 * np.clip((sound_mean - SOUND_BASELINE) / SOUND_SPAN, 0, 1)
+        + 0.5 * np.clip(flow_std / np.maximum(flow_mean, 1e-6), 0, 1),
+        0.0
+    )
+    small_pipe = np.clip((300 - diameter) / 300, 0, 1)
+
+    risk = np.clip(0.3 * defect + 0.2 * wear + 0.35 * prior + 0.1 * hydraulic + 0.05 * small_pipe, 0, 1)
+    confidence = 0.6 + 0.35 * (1 - np.exp(-count / 10))
+    return risk, confidence
+
+
+def _take(column, rows, full_copy):
+    """Fetch column values for rows as float32.
+
+    Small batches index the array directly; large ones snapshot the whole
+    column once (``tobytes`` copies under the GIL, so concurrent appends
+    never see an exported buffer).
+    """
+    if full_copy:
+        return np.frombuffer(column.tobytes(), dtype=column.typecode)[rows].astype(np.float32)
+    return np.fromiter((column[r] for r in rows.tolist()), dtype=np.float32, count=len(rows))
+
+
+class RiskScorer:
+    """Batch risk scoring over the fleet with a per-segment result cache.
+
+    A cached score is reused until the segment gets new readings.
+    """
+
+    def __init__(self, store, recent=RECENT_READINGS):
+        self.store = store
+        self.recent = recent
+        self._cache = {}
+        self._scored_at = {}
+
+    def score(self, segments):
+        """Return {segment_id: score dict}, rescoring only stale segments"""
+        stale = [
+            s for s in segments
+            if self._scored_at.get(s['id']) != len(self.store.segment_rows(s['id']))
+        ]
+        if stale:
+            self._score_batch(stale)
+        return {s['id']: self._cache[s['id']] for s in segments}
+
+    def _score_batch(self, segments):
+        store, recent = self.store, self.recent
+        n = len(segments)
+
+        # (segments, recent) matrix of row indices, -1 where a segment has
+        # fewer than `recent` readings
+        rows = np.full((n, recent), -1, dtype=np.int64)
+        count = np.zeros(n, dtype=np.int64)
+        totals = []
+        for i, segment in enumerate(segments):
+            segment_rows = store.segment_rows(segment['id'])
+            totals.append(len(segment_rows))
+            segment_rows = segment_rows[-recent:]
+            count[i] = len(segment_rows)
+            rows[i, :count[i]] = segment_rows
+        present = rows >= 0
+        flat = rows[present]
+        full_copy = len(flat) * 8 > len(store)
+
+        def matrix(column):
+            values = np.full((n, recent), np.nan, dtype=np.float32)
+            values[present] = _take(column, flat, full_copy)
+            return values
+
+        # Rows hold catalogue ids; map them to scores, keeping NaN padding
+        pacp_ids = matrix(store.pacp_code)
+        pacp = np.full_like(pacp_ids, np.nan)
+        pacp[present] = np.array(SCORES, dtype=np.float32)[pacp_ids[present].astype(np.int64)]
+        arrays = [
+            np.array([s['estimatedAge'] for s in segments], dtype=np.float32),
+            np.array([s['diameter'] for s in segments], dtype=np.float32),
+            np.array([MATERIAL_FACTOR.get(s['pipeType'], DEFAULT_MATERIAL_FACTOR) for s in segments], dtype=np.float32),
+            np.array([QUALITY_PRIOR.get(s['quality'], 0.5) for s in segments], dtype=np.float32),
+            count,
+            pacp,
+            matrix(store.sound_level),
+            matrix(store.flow_rate),
+        ]
+        risk, confidence = score_arrays(*arrays)
+
+        durability = np.rint(100 * (1 - risk)).astype(np.int64)
+        failure_months = np.clip(np.rint(120 * (1 - risk) ** 2), 3, 120).astype(np.int64)
+        corrosion = np.digitize(risk, [bound for bound, _ in CORROSION_LEVELS])
+        corrosion_labels = [label for _, label in CORROSION_LEVELS] + ['Critical']
+        priority = np.digitize(risk, [bound for bound, _ in reversed(PRIORITIES)]) - 1
+        priority_labels = [label for _, label in reversed(PRIORITIES)]
+
+        # Worst recent reading per segment, the most recent one on ties
+        worst = recent - 1 - np.argmax(np.nan_to_num(pacp, nan=-1.0)[:, ::-1], axis=1)
+        worst_rows = rows[np.arange(n), worst]
+
+        for i, segment in enumerate(segments):
+            self._cache[segment['id']] = {
+                'riskScore': round(float(risk[i]), 4),
+                'durabilityScore': int(durability[i]),
+                'corrosionLevel': corrosion_labels[corrosion[i]],
+                'maintenancePriority': priority_labels[priority[i]],
+                'predictedFailureMonths': int(failure_months[i]),
+                'confidence': round(float(confidence[i]), 4),
+                'worstReading': int(worst_rows[i]) if count[i] else None,
+            }
+            self._scored_at[segment['id']] = totals[i]
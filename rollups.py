@@ -0,0 +1,228 @@
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from data_version import next_version
+from reading_store import ValueDictionary
+
+# Bucket width in seconds per rollup resolution, finest first
+RESOLUTIONS = {'1m': 60, '1h': 3600, '1d': 86400}
+
+# API metric name -> ReadingStore column
+METRICS = {'temperature': 'temperature', 'soundLevel': 'sound_level', 'flowRate': 'flow_rate'}
+
+# History is drawn from the finest level with at most this many source
+# points per requested point, so downsampling cost is bounded by the
+# number of points asked for rather than by the length of the history
+HISTORY_OVERSAMPLE = 4
+
+DEFAULT_HISTORY_POINTS = 500
+MAX_HISTORY_POINTS = 5000
+
+
+class Level:
+    """Every segment's buckets at one resolution, in shared columns.
+
+    Buckets are appended to the columns as they are created, and each
+    segment keeps the indices of its own buckets ordered by start time, the
+    way ReadingStore indexes rows per segment. Each metric keeps its min,
+    max and sum per bucket in parallel columns.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.start = array('d')
+        self.count = array('I')
+        self.min = [array('f') for _ in METRICS]
+        self.max = [array('f') for _ in METRICS]
+        self.sum = [array('d') for _ in METRICS]
+        self._by_segment = {}
+
+    def __len__(self):
+        return len(self.start)
+
+    def add(self, segment, timestamp, values):
+        start = timestamp - timestamp % self.width
+        order = self._by_segment.get(segment)
+        if order is None:
+            order = self._by_segment[segment] = array('I')
+        # Readings normally arrive in time order and land in the segment's last bucket
+        if order and self.start[order[-1]] == start:
+            i = order[-1]
+        else:
+            pos = bisect_left(order, start, key=self.start.__getitem__)
+            if pos == len(order) or self.start[order[pos]] != start:
+                order.insert(pos, self._append(start, values))
+                return
+            i = order[pos]
+        self.count[i] += 1
+        for m, value in enumerate(values):
+            if value < self.min[m][i]:
+                self.min[m][i] = value
+            if value > self.max[m][i]:
+                self.max[m][i] = value
+            self.sum[m][i] += value
+
+    def _append(self, start, values):
+        i = len(self.start)
+        self.start.append(start)
+        self.count.append(1)
+        for m, value in enumerate(values):
+            self.min[m].append(value)
+            self.max[m].append(value)
+            self.sum[m].append(value)
+        return i
+
+    def span(self, segment, since=None, until=None):
+        """Return one segment's bucket indices with since <= start < until, oldest first"""
+        order = self._by_segment.get(segment)
+        if order is None:
+            return array('I')
+        key = self.start.__getitem__
+        lo = 0 if since is None else bisect_left(order, since - since % self.width, key=key)
+        hi = len(order) if until is None else bisect_left(order, until, key=key)
+        return order[lo:hi]
+
+
+class RollupIndex:
+    """Per-segment min/max/mean/count rollups at several resolutions.
+
+    Updated incrementally as readings are ingested, so a history chart costs
+    the same however much raw history a segment has accumulated. Segment ids
+    are dictionary-encoded and each resolution is one columnar Level for the
+    whole fleet.
+    """
+
+    def __init__(self, resolutions=RESOLUTIONS):
+        self.resolutions = dict(resolutions)
+        self.segments = ValueDictionary()
+        self._levels = {name: Level(width) for name, width in self.resolutions.items()}
+        self.version = next_version()
+
+    def add(self, segment_id, timestamp, values):
+        """Add one reading's metric values, in METRICS order"""
+        segment = self.segments.encode(segment_id)
+        for level in self._levels.values():
+            level.add(segment, timestamp, values)
+        self.version = next_version()
+
+    def observe(self, store, row):
+        self.add(
+            store.segments.decode(store.segment_code[row]),
+            store.timestamp[row],
+            [getattr(store, column)[row] for column in METRICS.values()]
+        )
+
+    def prime(self, store):
+        """Roll up the readings already in the store"""
+        for row in store.time_range():
+            self.observe(store, row)
+
+    def buckets(self, segment_id, resolution, since=None, until=None):
+        """Return a segment's buckets at one resolution as dicts, oldest first"""
+        level = self._levels.get(resolution)
+        segment = self.segments.lookup(segment_id)
+        if level is None or segment is None:
+            return []
+        return [
+            dict(
+                {'timestamp': datetime.fromtimestamp(level.start[i]).isoformat(), 'count': level.count[i]},
+                **{
+                    metric: {
+                        'min': round(level.min[m][i], 2),
+                        'max': round(level.max[m][i], 2),
+                        'mean': round(level.sum[m][i] / level.count[i], 2),
+                    }
+                    for m, metric in enumerate(METRICS)
+                }
+            )
+            for i in level.span(segment, _seconds(since), _seconds(until))
+        ]
+
+    def history(self, store, segment_id, metric, points=DEFAULT_HISTORY_POINTS, since=None, until=None):
+        """Return (resolution, points) for one metric, downsampled to at most ``points``.
+
+        Raw readings are used when the range holds few enough of them,
+        otherwise the finest rollup that does; the result is then reduced
+        with LTTB. Each point carries the min, max and count of what it
+        stands for.
+        """
+        m = list(METRICS).index(metric)
+        since, until = _seconds(since), _seconds(until)
+        budget = points * HISTORY_OVERSAMPLE
+
+        # Fetching one row past the budget tells whether the raw range fits
+        rows = store.segment_time_range(segment_id, since, until, limit=budget + 1)
+        if len(rows) <= budget:
+            column = getattr(store, METRICS[metric])
+            times = [store.timestamp[row] for row in rows]
+            values = [column[row] for row in rows]
+            lows = highs = values
+            counts = [1] * len(rows)
+            resolution = 'raw'
+        else:
+            segment = self.segments.lookup(segment_id)
+            resolution = level = indices = None
+            for resolution, level in sorted(self._levels.items(), key=lambda item: item[1].width):
+                indices = level.span(segment, since, until)
+                if len(indices) <= budget:
+                    break
+            times = [level.start[i] for i in indices]
+            counts = [level.count[i] for i in indices]
+            values = [level.sum[m][i] / level.count[i] for i in indices]
+            lows = [level.min[m][i] for i in indices]
+            highs = [level.max[m][i] for i in indices]
+
+        return resolution, [
+            {
+                'timestamp': datetime.fromtimestamp(times[i]).isoformat(),
+                'value': round(values[i], 2),
+                'min': round(lows[i], 2),
+                'max': round(highs[i], 2),
+                'count': counts[i],
+            }
+            for i in lttb(times, values, points)
+        ]
+
+
+def lttb(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets: indices of at most ``threshold`` points.
+
+    Keeps the first and last point and, from each of ``threshold - 2``
+    equal-width buckets in between, the point forming the largest triangle
+    with the previously kept point and the mean of the next bucket.
+    """
+    n = len(xs)
+    if threshold >= n or n <= 2:
+        return range(n)
+    if threshold <= 2:
+        return [0, n - 1][:threshold]
+
+    every = (n - 2) / (threshold - 2)
+    kept = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end >= next_end:
+            # The last bucket's "next" is the final point itself
+            avg_x, avg_y = xs[n - 1], ys[n - 1]
+        else:
+            avg_x = sum(xs[end:next_end]) / (next_end - end)
+            avg_y = sum(ys[end:next_end]) / (next_end - end)
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+
+def _seconds(value):
+    return value.timestamp() if isinstance(value, datetime) else value
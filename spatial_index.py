@@ -0,0 +1,147 @@
+from math import floor
+
+from data_version import next_version
+from fleet_metrics import QUALITY_LEVELS
+
+# Grid cell size in degrees (~500 m of latitude)
+DEFAULT_CELL_SIZE = 0.005
+
+# Above this zoom level every segment is returned individually
+CLUSTER_MAX_ZOOM = 16
+
+# Web Mercator zoom levels accepted by bbox queries
+MIN_ZOOM = 0
+MAX_ZOOM = 22
+
+# Approximate on-screen size of a cluster, in pixels
+CLUSTER_RADIUS_PX = 64
+
+# Decimal places kept for coordinates in GeoJSON output (~10 cm)
+COORDINATE_PRECISION = 6
+
+
+class GridIndex:
+    """Uniform latitude/longitude grid over pipe segments for bbox queries"""
+
+    def __init__(self, segments=(), cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._segments = {}
+        self.version = next_version()
+        for segment in segments:
+            self.add(segment)
+
+    def __len__(self):
+        return len(self._segments)
+
+    def _cell(self, latitude, longitude):
+        return (floor(latitude / self.cell_size), floor(longitude / self.cell_size))
+
+    def add(self, segment):
+        """Add a segment, or move/replace the existing one with the same id"""
+        if segment['id'] in self._segments:
+            self.remove(segment['id'])
+        cell = self._cell(segment['latitude'], segment['longitude'])
+        self._cells.setdefault(cell, {})[segment['id']] = segment
+        self._segments[segment['id']] = segment
+        self.version = next_version()
+
+    update = add
+
+    def remove(self, segment_id):
+        segment = self._segments.pop(segment_id)
+        cell = self._cell(segment['latitude'], segment['longitude'])
+        del self._cells[cell][segment_id]
+        if not self._cells[cell]:
+            del self._cells[cell]
+        self.version = next_version()
+
+    def get(self, segment_id):
+        return self._segments.get(segment_id)
+
+    def query(self, west, south, east, north):
+        """Return the segments inside a bounding box"""
+        row_lo, col_lo = self._cell(south, west)
+        row_hi, col_hi = self._cell(north, east)
+
+        # Zoomed far out, walking the occupied cells beats enumerating the box
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self._cells):
+            cells = [
+                bucket for (row, col), bucket in self._cells.items()
+                if row_lo <= row <= row_hi and col_lo <= col <= col_hi
+            ]
+        else:
+            cells = [
+                self._cells[(row, col)]
+                for row in range(row_lo, row_hi + 1)
+                for col in range(col_lo, col_hi + 1)
+                if (row, col) in self._cells
+            ]
+
+        return [
+            segment for bucket in cells for segment in bucket.values()
+            if south <= segment['latitude'] <= north and west <= segment['longitude'] <= east
+        ]
+
+
+def cluster_size(zoom):
+    """Cluster cell size in degrees for a Web Mercator zoom level"""
+    return 360 * CLUSTER_RADIUS_PX / (256 * 2 ** zoom)
+
+
+def to_geojson(segments, zoom, pacp_score):
+    """Build a compact GeoJSON FeatureCollection, clustering below CLUSTER_MAX_ZOOM.
+
+    ``pacp_score`` maps a segment id to its worst observed PACP score. Each
+    cluster carries its member count, worst quality and max PACP score.
+    """
+    if zoom > CLUSTER_MAX_ZOOM:
+        return _collection([_segment_feature(segment, pacp_score) for segment in segments])
+
+    size = cluster_size(zoom)
+    clusters = {}
+    for segment in segments:
+        key = (floor(segment['latitude'] / size), floor(segment['longitude'] / size))
+        clusters.setdefault(key, []).append(segment)
+
+    features = []
+    for members in clusters.values():
+        if len(members) == 1:
+            features.append(_segment_feature(members[0], pacp_score))
+            continue
+        scores = [score for score in (pacp_score(m['id']) for m in members) if score is not None]
+        features.append(_feature(
+            sum(m['latitude'] for m in members) / len(members),
+            sum(m['longitude'] for m in members) / len(members),
+            {
+                'cluster': True,
+                'count': len(members),
+                'quality': max((m['quality'] for m in members), key=QUALITY_LEVELS.index),
+                'pacpScore': max(scores, default=None),
+            }
+        ))
+    return _collection(features)
+
+
+def _segment_feature(segment, pacp_score):
+    return _feature(segment['latitude'], segment['longitude'], {
+        'id': segment['id'],
+        'name': segment['name'],
+        'quality': segment['quality'],
+        'pacpScore': pacp_score(segment['id']),
+    })
+
+
+def _feature(latitude, longitude, properties):
+    return {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [round(longitude, COORDINATE_PRECISION), round(latitude, COORDINATE_PRECISION)],
+        },
+        'properties': properties,
+    }
+
+
+def _collection(features):
+    return {'type': 'FeatureCollection', 'features': features}